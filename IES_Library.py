@@ -12,13 +12,70 @@ import os
 import subprocess
 import platform
 import sys
+import threading
 
 import maya.cmds as cmds
 
 # Global variables
 UI_selectedProfileLabel = ""
 UI_selectedProfileImage = "help.png"
+UI_selectedProfilePolar = ""
+UI_previewTabs = ""
+UI_selectedProfileInfo = ""
 missingThumbnails = []
+thumbnailRenderList = []
+thumbnailDuplicates = {}
+IESProfileData = {}
+IESCatalog = None
+IESLibraryState = None
+IESImageState = None
+IESPyramidStates = {}
+IESSimilarity = None
+IESCards = {}
+IESCardList = []
+IESShownFiles = []
+IESCardPage = 0
+IESCardColumns = 3
+IESCardContents = {}
+IESSearch = ""
+IESSortBy = "Name"
+IESCardSize = 128
+IESAtlas = None
+IESCardLoader = None
+IESCardShown = {}
+IESPlaceholderImage = ""
+IESThumbnailLock = threading.Lock()
+thumbnailManifest = None
+thumbnailJobWatcher = None
+thumbnailJobPublished = set()
+UI_jobLayout = ""
+UI_jobLabel = ""
+UI_jobProgress = ""
+UI_jobButton = ""
+UI_pageLabel = ""
+UI_thumbnailLayout = ""
+
+# Browser sort options, label: (catalog column, descending)
+IESSortOptions = {
+    "Name": ("name", False),
+    "Beam angle": ("beamAngle", False),
+    "Field angle": ("fieldAngle", False),
+    "Lumens": ("output", True),
+    "Efficacy": ("efficacy", True),
+    "Peak candela": ("peakCandela", True),
+    "Spacing criterion": ("spacingCriterion", False),
+}
+
+# The card browser shows this many rows of cards per page, the cards are reused
+# from page to page so the window stays quick however large the library is
+cardPageRows = 8
+
+# Thumbnail render processes run side by side, capped by the number of cores
+thumbnailRenderWorkers = 4
+
+# Cards cut their thumbnails out of a few atlas pages instead of opening one
+# image per card, much faster on a network share. Needs Maya's PySide
+useThumbnailAtlas = True
 
 # Local folder location
 IESLibraryDirectory = "/Users/grahamconnell/Downloads/IES_Library" # Sets folder for IES library tool
@@ -48,11 +105,27 @@ def createIESWindow() -> None:
     """Creates tool's only window where all functions and UI is stored."""
 
     IESwindowName = "IES Profile library"
-    global UI_cardLayout, IESCardList
+    global UI_cardLayout, IESCardList, IESProfileData, IESCatalog, IESSearch
+    global IESLibraryState, IESSortBy, IESSimilarity, UI_searchField
 
     if cmds.workspaceControl(IESwindowName, query=True, exists=True):
         cmds.deleteUI(IESwindowName)
 
+    # List the library once, later rescans only report what changed
+    import libraryState
+
+    IESLibraryState = libraryState.LibraryState(IESLibraryDirectory + "/IES_files")
+    IESLibraryState.refresh()
+
+    # Photometric data, read from the profile cache and indexed for search
+    IESProfileData = loadIESProfiles()
+    IESCatalog = loadIESCatalog(IESProfileData)
+    loadThumbnailManifest()
+    findMissingThumbnails()
+    IESSearch = ""
+    IESSortBy = "Name"
+    IESSimilarity = None
+
     # Initialize window
     cmds.workspaceControl(IESwindowName, minimumWidth=514)
     UI_mainLayout = cmds.formLayout(numberOfDivisions=12, margins=8)
@@ -77,26 +150,61 @@ def createIESWindow() -> None:
         annotation="Generate missing thumbnails",
         command=lambda *args: generateThumbnails(),
     )
+    UI_refreshLibrary = cmds.iconTextButton(
+        style="iconOnly",
+        image="refresh.png",
+        annotation="Rescan library for added, removed or changed profiles",
+        command=lambda *args: refreshLibrary(),
+    )
 
     cmds.setParent(UI_mainLayout)
 
+    UI_searchLayout = cmds.rowLayout(
+        numberOfColumns=5, adjustableColumn=1, parent=UI_mainLayout
+    )
+    UI_searchField = cmds.textField(
+        placeholderText="Search profiles, e.g. halo beam<40",
+        annotation="Filter by text or fields: manufacturer, lumcat, luminaire, lamp, lumens, output, watts, beam, field, peak, efficacy, spacing, type",
+        changeCommand=lambda search: filterProfileCards(search),
+        enterCommand=lambda search: filterProfileCards(search),
+    )
+    cmds.optionMenu(
+        label="Sort by",
+        annotation="Sort profiles by photometric metrics",
+        changeCommand=lambda sortLabel: sortProfileCards(
+            sortLabel, UI_thumbnailLayout, UI_numberColumns
+        ),
+    )
+    for sortLabel in IESSortOptions:
+        cmds.menuItem(label=sortLabel)
+    cmds.setParent(UI_searchLayout)
+    global UI_pageLabel
+    cmds.button(label="<", width=24, annotation="Previous page", command=lambda *args: showCardPage(IESCardPage - 1))
+    UI_pageLabel = cmds.text(label="", width=110, align="center")
+    cmds.button(label=">", width=24, annotation="Next page", command=lambda *args: showCardPage(IESCardPage + 1))
+    cmds.setParent(UI_mainLayout)
+
     UI_primaryLayout = cmds.rowColumnLayout(adjustableColumn=True, numberOfColumns=2)
+    global UI_thumbnailLayout, IESPlaceholderImage
     UI_thumbnailLayout = cmds.scrollLayout(
         parent=UI_mainLayout, backgroundColor=(0.17, 0.17, 0.17)
     )
 
-    # IES profile cards
-    IESfiles = IESFileList()
-    UI_cardLayout = cmds.rowColumnLayout(numberOfColumns=3)
-    IESCardList = []
-    # Build each card based on the ies files in the folder
-    for IESfile in IESfiles:
-        IESCardList.append(createCardUI(IESfile))
+    # IES profile cards, one page at a time. Cards show a placeholder until
+    # their thumbnail has loaded in the background
+    import thumbnailPyramid
+
+    IESPlaceholderImage = thumbnailPyramid.placeholderPath(IESLibraryDirectory + "/IES_cache")
+    global IESShownFiles, IESCardPage
+    IESShownFiles = sortedFileList()
+    IESCardPage = 0
+    UI_cardLayout, IESCardList = createThumbnailUI(UI_thumbnailLayout, columns=3)
 
     # Current selection preview
     cmds.setParent(UI_primaryLayout)
     UI_columnRight = cmds.rowColumnLayout(numberOfColumns=1, parent=UI_mainLayout)
     cmds.text("Selected profile", font="boldLabelFont", align="left")
+    global selectedIESProfile
     selectedIESProfile = IESFileList()[0]
     global UI_selectedProfileLabel
     UI_selectedProfileLabel = cmds.text(
@@ -105,16 +213,64 @@ def createIESWindow() -> None:
     cmds.separator(height=4, width=1, visible=False)
     global UI_selectedProfileImage
     firstImage = selectedIESProfile.split(".")[0] or "help"
+    global UI_selectedProfilePolar, UI_previewTabs
+    UI_previewTabs = cmds.tabLayout(
+        parent=UI_columnRight,
+        changeCommand=lambda *args: selectIESProfile(selectedIESProfile),
+    )
+    UI_renderTab = cmds.columnLayout(parent=UI_previewTabs)
     UI_selectedProfileImage = cmds.iconTextStaticLabel(
-        image=f"{IESLibraryDirectory}/IES_images/{firstImage}.png",
+        image=previewImagePath(firstImage),
         style="iconOnly",
         width=256,
         height=256,
+        parent=UI_renderTab,
+    )
+    UI_polarTab = cmds.columnLayout(parent=UI_previewTabs)
+    UI_selectedProfilePolar = cmds.iconTextStaticLabel(
+        image=f"{IESLibraryDirectory}/IES_images/help.png",
+        style="iconOnly",
+        width=256,
+        height=256,
+        parent=UI_polarTab,
+    )
+    cmds.tabLayout(
+        UI_previewTabs,
+        edit=True,
+        tabLabel=((UI_renderTab, "Render"), (UI_polarTab, "Polar")),
+    )
+    global UI_selectedProfileInfo
+    UI_selectedProfileInfo = cmds.text(
+        profileDescription(selectedIESProfile),
+        align="left",
+        wordWrap=True,
+        parent=UI_columnRight,
+    )
+    cmds.button(
+        label="Show similar profiles",
+        annotation="Only show profiles with a light distribution similar to the selected profile",
+        command=lambda *args: showSimilarProfiles(),
         parent=UI_columnRight,
     )
 
+    # Background thumbnail job progress, only shown while there's a job
+    global UI_jobLayout, UI_jobLabel, UI_jobProgress, UI_jobButton
+    UI_jobLayout = cmds.columnLayout(
+        adjustableColumn=True, parent=UI_columnRight, manage=False
+    )
+    UI_jobLabel = cmds.text(label="", align="left")
+    cmds.rowLayout(numberOfColumns=2, adjustableColumn=1)
+    UI_jobProgress = cmds.progressBar(maxValue=1, width=180)
+    UI_jobButton = cmds.button(
+        label="Cancel",
+        annotation="Stop or resume rendering thumbnails, finished thumbnails are kept",
+        command=lambda *args: thumbnailJobButton(),
+    )
+    cmds.setParent(UI_columnRight)
+    watchThumbnailJob()
+
     cmds.setParent(UI_mainLayout)
-    UI_numberColumns = cmds.intSliderGrp(label="Columns: 1", width=240,value=3, min=1, max=6, extraLabel=" 6", cc=lambda *args: editThumbnailColumns(UI_thumbnailLayout, UI_thumbnailLayout,UI_numberColumns, UI_cardLayout))
+    UI_numberColumns = cmds.intSliderGrp(label="Columns: 1", width=240,value=3, min=1, max=6, extraLabel=" 6", cc=lambda *args: editThumbnailColumns(UI_thumbnailLayout, IESCardList, UI_numberColumns, UI_cardLayout))
     # Build UI for compatible lights
     cmds.separator(height=8, width=1, visible=False)
     cmds.text(
@@ -187,13 +343,16 @@ def createIESWindow() -> None:
             (UI_lightButtons, "bottom", 4),
             (UI_columnRight, "right", 8),
             (UI_columnRight, "top", 8),
-            (UI_thumbnailLayout, "top", 8),
+            (UI_searchLayout, "top", 8),
+            (UI_searchLayout, "left", 8),
             (UI_thumbnailLayout, "left", 8),
             (UI_IESLightList, "right", 0),
             (UI_numberColumns, "bottom", 8)
         ],
         attachNone=[(UI_actionShelf, "right")],
         attachControl=[
+            (UI_searchLayout, "right", 8, UI_columnRight),
+            (UI_thumbnailLayout, "top", 4, UI_searchLayout),
             (UI_thumbnailLayout, "bottom", 8, UI_actionShelf),
             (UI_thumbnailLayout, "right", 8, UI_columnRight),
             (UI_columnRight, "bottom", 8, UI_primaryLayout),
@@ -205,29 +364,119 @@ def createIESWindow() -> None:
     )
     cmds.showWindow(IESwindowName)
 
+    # Scale and pack new thumbnails once the window is up
+    updateThumbnailsInBackground()
+
 
 def editThumbnailColumns(parentLayout, cardList, UI_columns, UI_thumbnails) -> None:
+    """Reflows the existing cards into the chosen number of columns. Cards are
+    resized in place, new ones are only created when a page holds more cards."""
+    import thumbnailPyramid
+
+    global IESCardSize, IESCardColumns, IESCardPage
     columns = cmds.intSliderGrp(UI_columns, query=True, value=True)
 
-    cmds.deleteUI(UI_thumbnails)
-    global UI_cardLayout, IESCardList
-    UI_cardLayout, IESCardList = createThumbnailUI(parentLayout, columns=columns)
+    # Stay on the page that holds the first card shown now
+    firstCard = IESCardPage * cardsPerPage()
+    previousLevel = thumbnailPyramid.levelSize(IESCardSize)
+    IESCardColumns = columns
+    IESCardSize = cardSizeForColumns(columns)
+    IESCardPage = firstCard // cardsPerPage()
+    if thumbnailPyramid.levelSize(IESCardSize) != previousLevel:
+        readThumbnailAtlas()
+        updateThumbnailsInBackground()
+
+    cmds.gridLayout(UI_thumbnails, edit=True, numberOfColumns=columns, cellWidthHeight=cardCellSize())
+    cmds.setParent(UI_thumbnails)
+    while len(cardList) < cardsPerPage():
+        cardList.append(createCardUI(IESCardSize))
+    for _UI_card, UI_cardImage in cardList:
+        cmds.iconTextButton(UI_cardImage, edit=True, width=IESCardSize, height=IESCardSize + 16)
+    fillCardPage(cardList)
 
 
 def createThumbnailUI(parentLayout, columns=3):
-    # IES profile cards
-    IESfiles = IESFileList()
-    UI_cardLayout = cmds.rowColumnLayout(numberOfColumns=columns, parent=parentLayout)
-    IESCardList = []
-    # Build each card based on the ies files in the folder
-    for IESfile in IESfiles:
-        IESCardList.append(createCardUI(IESfile))
+    """Creates a page of empty profile cards and fills them with the current page.
+    Returns the card layout and the list of (card, card image) controls."""
+    # IES profile cards, fewer columns show larger cards
+    global IESCardSize, IESCardColumns
+    IESCardSize = cardSizeForColumns(columns)
+    IESCardColumns = columns
+    readThumbnailAtlas()
+    UI_cardLayout = cmds.gridLayout(
+        numberOfColumns=columns, cellWidthHeight=cardCellSize(), parent=parentLayout
+    )
+    IESCardList = [createCardUI(IESCardSize) for _card in range(cardsPerPage())]
     
     #cmds.formLayout(formLayout, edit=True, attachForm=(UI_cardLayout, "bottom", 24))
 
+    fillCardPage(IESCardList)
     return UI_cardLayout, IESCardList
 
 
+def cardsPerPage() -> int:
+    return cardPageRows * IESCardColumns
+
+
+def cardCellSize() -> tuple:
+    """Width and height of a card's cell in the card grid."""
+    return IESCardSize + 8, IESCardSize + 24
+
+
+def fillCardPage(cardList) -> None:
+    """Shows the profiles of the current page on the reused cards and hides the spare cards."""
+    global IESCardPage
+    pageCount = max(1, -(-len(IESShownFiles) // cardsPerPage()))
+    IESCardPage = min(max(IESCardPage, 0), pageCount - 1)
+    start = IESCardPage * cardsPerPage()
+    pageFiles = IESShownFiles[start : start + cardsPerPage()]
+
+    IESCards.clear()
+    requests = []
+    for slot, (UI_card, UI_cardImage) in enumerate(cardList):
+        if slot < len(pageFiles):
+            request = fillCardUI(UI_card, UI_cardImage, pageFiles[slot])
+            if request:
+                requests.append((slot, request))
+        cmds.rowLayout(UI_card, edit=True, manage=slot < len(pageFiles))
+
+    # Cards in view load first, thumbnails still loading for the last page are dropped
+    visibleSlots = visibleCardSlots()
+    requests.sort(key=lambda slotRequest: slotRequest[0] not in visibleSlots)
+    cardLoader().load([request for _slot, request in requests])
+
+    if UI_pageLabel:
+        cmds.text(
+            UI_pageLabel,
+            edit=True,
+            label=f"Page {IESCardPage + 1}/{pageCount} ({len(IESShownFiles)})",
+        )
+
+
+def visibleCardSlots() -> set:
+    """Card slots in the part of the card browser that's scrolled into view."""
+    cellHeight = cardCellSize()[1]
+    if not UI_thumbnailLayout or not cmds.scrollLayout(UI_thumbnailLayout, exists=True):
+        return set(range(cardsPerPage()))
+    top = cmds.scrollLayout(UI_thumbnailLayout, query=True, scrollAreaValue=True)[0]
+    height = cmds.scrollLayout(UI_thumbnailLayout, query=True, scrollAreaHeight=True)
+    firstRow = top // cellHeight
+    lastRow = (top + height) // cellHeight
+    return set(range(firstRow * IESCardColumns, (lastRow + 1) * IESCardColumns))
+
+
+def showCardPage(page) -> None:
+    """Shows another page of profile cards."""
+    global IESCardPage
+    IESCardPage = page
+    fillCardPage(IESCardList)
+
+
+def cardSizeForColumns(columns) -> int:
+    """Card image size in pixels for the number of card columns."""
+    return max(64, min(256, 384 // max(columns, 1)))
+
+
 def openHelpDocumentation() -> None:
     """Opens help documentation for this IES Library"""
     helpDocument = os.path.join(IESLibraryDirectory, "README.pdf")
@@ -268,11 +517,25 @@ def duplicateThumbnailScene(newSceneName="/IESMakeThumbnails1.ma"):
 def generateThumbnails() -> None:
     """Asks user how they want to generate missing thumbnail images, then starts the process to complete the renders, or builds the scene if 'Manual' option is selected"""
 
-    # Catch if missingThumbnails list is empty, stop function if yes
-    if len(missingThumbnails) <= 0:
+    # Catch if there's nothing missing or outdated, stop function if yes
+    loadThumbnailManifest()
+    thumbnailsToRender = outdatedThumbnails()
+    if len(thumbnailsToRender) <= 0:
         cmds.warning("No lights are missing images.")
         cmds.confirmDialog(
-            message="No missing thumbnails, this feature only works on ies files with no image with a matching name.",
+            message="No missing or outdated thumbnails, this feature only works on ies files with no image with a matching name, or that changed since their thumbnail was rendered.",
+            button=["Ok"],
+            cancelButton="Ok",
+        )
+        return
+
+    # Only render one profile per group of photometric duplicates
+    global thumbnailRenderList, thumbnailDuplicates
+    thumbnailDuplicates = groupMissingThumbnails(thumbnailsToRender)
+    thumbnailRenderList = list(thumbnailDuplicates)
+    if len(thumbnailRenderList) <= 0:
+        cmds.confirmDialog(
+            message="Every missing thumbnail was copied from a duplicate profile that already has an image. Relaunch the tool to see them.",
             button=["Ok"],
             cancelButton="Ok",
         )
@@ -281,9 +544,9 @@ def generateThumbnails() -> None:
     # Get decision from user about render engine to use
     popupGenerate = cmds.confirmDialog(
         title="Generate thumbnails",
-        message="Creates thumbnails for any ies file that is missing one.\n\nThe background process can take several minutes, you'll see a popup once the operation is complete.\n\nSee README for more help with this function.",
+        message=f"Creates thumbnails for any ies file that is missing one, or whose file changed since it was rendered ({len(thumbnailRenderList)} to render).\n\nAnalytic draws the thumbnails straight from the photometric data in a few seconds, no renderer needed.\n\nThe Arnold and Redshift background process can take several minutes, you'll see a popup once the operation is complete.\n\nSee README for more help with this function.",
         icon="question",
-        button=["Cancel", "Manual", "Redshift", "Arnold"],
+        button=["Cancel", "Manual", "Redshift", "Arnold", "Analytic"],
         cancelButton="Cancel",
         defaultButton="Arnold",
         dismissString="Aborted thumbnail generation",
@@ -291,15 +554,20 @@ def generateThumbnails() -> None:
     match popupGenerate:
         case "Cancel":
             return
+        case "Analytic":
+            renderAnalyticThumbnails()
         case "Manual":
             duplicateThumbnailScene("/IESMakeThumbnailsManual.ma")
-
-            # Create batch file
-            batchFile = createBatFile(
-                buildScene=True, renderScene=False, renderEngine="both"
+            buildCommand = buildGenerateScene(
+                thumbnailRenderList,
+                IESLibraryDirectory,
+                renderFrames=False,
+                renderer="both",
+                newScenePath="/IESMakeThumbnailsManual.ma",
             )
-            if batchFile == "didn't work":
-                cmds.warning("Error creating thumbnail batch file. Aborted process.")
+            if buildCommand is None:
+                cmds.warning("Error creating thumbnail scene command. Aborted process.")
+                return
 
             # Warn user this could take a bit
             UI_thumbnailWarning = cmds.confirmDialog(
@@ -312,12 +580,11 @@ def generateThumbnails() -> None:
             if UI_thumbnailWarning == "Cancel":
                 return
 
-            # Build scene and render
+            # Build scene
             cmds.warning(
-                "Building thumbnails in background, this will take a few moments"
+                "Building thumbnail scene, this will take a few moments"
             )
-            executeBatFile(batchFile)
-            subprocess.run(["attrib", "+h", batchFile], shell=True)
+            subprocess.run(buildCommand)
 
             cmds.confirmDialog(
                 title="Scene created",
@@ -326,21 +593,10 @@ def generateThumbnails() -> None:
                 cancelButton="Ok",
                 defaultButton="Ok",
             )
-        case "Arnold":
-            # Create a duplicate of thumbnail scene
-            duplicateThumbnailScene()
-
-            # Create batch file
-            batchFile = createBatFile(
-                buildScene=True, renderScene=True, renderEngine="arnold"
-            )
-            if batchFile == "didn't work":
-                cmds.warning("Error creating thumbnail batch file. Aborted process.")
-                return
-
+        case "Arnold" | "Redshift":
             # Warn user this could take a bit
             UI_thumbnailWarning = cmds.confirmDialog(
-                title="Arnold thumbnail generation",
+                title=f"{popupGenerate} thumbnail generation",
                 message="This process can take several minutes. You may continue to use Maya, rendering will be done in the background.",
                 b=["Cancel", "Continue"],
                 cancelButton="Cancel",
@@ -349,99 +605,192 @@ def generateThumbnails() -> None:
             if UI_thumbnailWarning == "Cancel":
                 return
 
-            # Build scene and render
+            # Build scenes and render
+            if not startThumbnailJob(popupGenerate.lower()):
+                cmds.warning("Error creating thumbnail job. Aborted process.")
+                return
             cmds.warning(
                 "Rendering thumbnails in background, this will take a few moments"
             )
-            executeBatFile(batchFile)
-            process = subprocess.Popen(["attrib", "+h", batchFile], shell=True) # hides bat file in explorer
 
-        case "Redshift":
-            # Create a duplicate of thumbnail scene
-            duplicateThumbnailScene()
+        case _:
+            pass
 
-            
 
-            # Create batch file
-            batchFile = createBatFile(
-                buildScene=True, renderScene=True, renderEngine="redshift"
-            )
-            if batchFile == "didn't work":
-                cmds.warning("Error creating thumbnail batch file. Aborted process.")
-                return
+def renderAnalyticThumbnails() -> None:
+    """Renders the missing thumbnails from the photometric data with iesRender,
+    then updates the profile cards with the new images."""
+    import iesRender
 
-            # Warn user this could take a bit, the
-            UI_thumbnailWarning = cmds.confirmDialog(
-                title="Redshift thumbnail generation",
-                message="This process can take several minutes, Maya is frozen during this time. Your current scene will remain open.\n\nYou'll see a message once the process has finished",
-                b=["Cancel", "Continue"],
-                cancelButton="Cancel",
-                defaultButton="Continue",
-            )
-            if UI_thumbnailWarning == "Cancel":
-                return
+    profileFiles = {IESfile.split(".")[0]: IESfile for IESfile in IESFileList()}
+    profiles = {
+        profileName: IESProfileData[profileFiles[profileName]]
+        for profileName in thumbnailRenderList
+    }
 
-            # Build scene and render
-            cmds.warning(
-                "Building thumbnails in background, this will take a few moments"
-            )
-            executeBatFile(batchFile)
-            process = subprocess.Popen(["attrib", "+h", batchFile], shell=True)
+    imageDirectory = IESLibraryDirectory + "/IES_images"
+    cmds.progressWindow(
+        title="Analytic thumbnails", progress=0, maxValue=max(len(profiles), 1), isInterruptable=False
+    )
+    try:
+        iesRender.renderThumbnails(
+            profiles,
+            imageDirectory,
+            progress=lambda done, total: cmds.progressWindow(edit=True, progress=done),
+        )
+    finally:
+        cmds.progressWindow(endProgress=True)
+
+    # Duplicates share the rendered image
+    for profileName, duplicates in thumbnailDuplicates.items():
+        for duplicate in duplicates:
+            linkOrCopy(f"{imageDirectory}/{profileName}.png", f"{imageDirectory}/{duplicate}.png")
+    recordThumbnailJob("analytic")
+
+    renderedNames = list(thumbnailRenderList)
+    for duplicates in thumbnailDuplicates.values():
+        renderedNames.extend(duplicates)
+    updateCardImages(renderedNames)
+    selectIESProfile(selectedIESProfile)
+
+    cmds.confirmDialog(
+        title="Thumbnails created",
+        message=f"Created {len(thumbnailRenderList)} analytic thumbnails in the IES_images folder.",
+        button=["Ok"],
+        cancelButton="Ok",
+    )
 
-        case _:
-            pass
 
+def updateCardImages(profileNames) -> None:
+    """Shows newly created thumbnails on the profiles' cards once they're
+    scaled, all in one background update."""
+    for profileName in profileNames:
+        if profileName in missingThumbnails:
+            missingThumbnails.remove(profileName)
+    updateThumbnailsInBackground(profileNames)
 
-def windowsNotification() -> str:
-    command = "python " + os.path.join(IESLibraryDirectory, "windowsNotification.py")
 
-    return command
+def watchThumbnailJob() -> None:
+    """Polls the background thumbnail job from a worker thread and shows its
+    progress in the window. Polling stops once the job isn't running."""
+    import time
+    import maya.utils
+    import thumbnailJob
 
+    global thumbnailJobWatcher
+    if thumbnailJobWatcher is not None and thumbnailJobWatcher.is_alive():
+        return
 
-def createBatFile(buildScene=False, renderScene=False, renderEngine="arnold") -> str:
-    """Creates .bat file with a command to build the thumbnail scene, and render the scene (both optional)."""
+    cacheDirectory = IESLibraryDirectory + "/IES_cache"
+    startTime = time.time()
+
+    def poll():
+        while True:
+            job = thumbnailJob.readJob(cacheDirectory)
+            maya.utils.executeDeferred(updateThumbnailJobUI, job)
+            # Give a job that was just launched time to start
+            starting = time.time() - startTime < thumbnailJob.staleAfter
+            if job is None or not (starting or thumbnailJob.isRunning(job)):
+                return
+            time.sleep(2)
+
+    thumbnailJobWatcher = threading.Thread(target=poll, daemon=True)
+    thumbnailJobWatcher.start()
 
-    if not buildScene and not renderScene:
-        return "didn't work"
-    
-    if buildScene:
-        generateScenePrompt = buildGenerateScene(
-            missingThumbnails, IESLibraryDirectory, renderer=renderEngine
-        )
-    if renderScene:
-        renderScene = backgroundRender(
-            missingThumbnails, IESLibraryDirectory, renderEngine
-        )
-        cleanupScene = thumbnailCleanup()
-    if generateScenePrompt is None or renderScene is None:
-        return "didn't work"
 
-    batFilePath = os.path.join(IESLibraryDirectory, "batchProcess.bat")
+def updateThumbnailJobUI(job) -> None:
+    """Shows the progress of a thumbnail job and the thumbnails it has finished so far."""
+    import thumbnailJob
+
+    if not cmds.columnLayout(UI_jobLayout, exists=True):
+        return
+    if job is None:
+        cmds.columnLayout(UI_jobLayout, edit=True, manage=False)
+        return
 
-    if os.path.isfile(batFilePath):
-        subprocess.run(["attrib", "-h", batFilePath], shell=True)
+    newImages = []
+    for profileName, profile in job["profiles"].items():
+        if profile["state"] == thumbnailJob.DONE and profileName not in thumbnailJobPublished:
+            thumbnailJobPublished.add(profileName)
+            newImages.extend([profileName] + profile["duplicates"])
+    if newImages:
+        updateCardImages(newImages)
+        selectIESProfile(selectedIESProfile)
+
+    counts = thumbnailJob.jobProgress(job)
+    running = thumbnailJob.isRunning(job)
+    if thumbnailJob.isFinished(job) and not running:
+        cmds.columnLayout(UI_jobLayout, edit=True, manage=False)
+        loadThumbnailManifest()
+        return
 
-    with open(batFilePath, "w+") as batFile:
-        if buildScene:
-            batFile.write(generateScenePrompt + "\n")
-        if renderScene:
-            batFile.write(renderScene + "\n")
-            batFile.write(cleanupScene + "\n")
-            if platform.system() == "Windows":
-                batFile.write(windowsNotification())
+    if running:
+        label = f"Rendering thumbnails {counts['done']}/{counts['total']}"
+    else:
+        label = f"Thumbnail job stopped, {counts['done']}/{counts['total']} done"
+        if counts["failed"]:
+            label += f", {counts['failed']} failed"
+    cmds.columnLayout(UI_jobLayout, edit=True, manage=True)
+    cmds.text(UI_jobLabel, edit=True, label=label)
+    cmds.progressBar(
+        UI_jobProgress, edit=True, maxValue=max(counts["total"], 1), progress=counts["done"]
+    )
+    cmds.button(UI_jobButton, edit=True, label="Cancel" if running else "Resume")
 
-    return batFilePath
 
+def thumbnailJobButton() -> None:
+    """Cancels the running thumbnail job, or resumes a stopped one from its last finished frame."""
+    import thumbnailJob
 
-def executeBatFile(batFilePath: str = None) -> None:
-    """Executes the provided .bat file."""
+    cacheDirectory = IESLibraryDirectory + "/IES_cache"
+    if cmds.button(UI_jobButton, query=True, label=True) == "Cancel":
+        thumbnailJob.requestCancel(cacheDirectory)
+        cmds.button(UI_jobButton, edit=True, label="Cancelling...")
+        return
 
-    if batFilePath is None or not os.path.isfile(batFilePath):
+    job = thumbnailJob.readJob(cacheDirectory)
+    if job is None or thumbnailJob.isRunning(job):
         return
-    assert batFilePath.split(".")[-1] == "bat", "File must be .bat"
+    launchThumbnailJob(job)
+    cmds.button(UI_jobButton, edit=True, label="Cancel")
+    watchThumbnailJob()
 
-    process = subprocess.Popen([batFilePath], shell=True)
-    return
+
+def startThumbnailJob(renderer: str) -> bool:
+    """Writes a thumbnail job for the missing thumbnails to the IES_cache folder
+    and starts thumbnailJob.py to run it in the background."""
+    import thumbnailJob
+
+    mayapyPath = mayaExecutable("mayapy")
+    renderPath = mayaExecutable("Render")
+    if mayapyPath is None or renderPath is None:
+        return False
+
+    job = thumbnailJob.createJob(
+        IESLibraryDirectory + "/IES_cache",
+        IESLibraryDirectory,
+        renderer,
+        thumbnailDuplicates,
+        mayapyPath,
+        renderPath,
+        workers=thumbnailRenderWorkers,
+    )
+    queueThumbnailJob(renderer)
+    thumbnailJobPublished.clear()
+    launchThumbnailJob(job)
+    watchThumbnailJob()
+    return True
+
+
+def launchThumbnailJob(job: dict) -> None:
+    """Runs or resumes the thumbnail job in the IES_cache folder with the job's mayapy.
+    Progress is logged to IES_cache/thumbnailJob.log."""
+    subprocess.Popen(
+        [job["mayapy"], IESLibraryDirectory + "/thumbnailJob.py", IESLibraryDirectory + "/IES_cache"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),  # no console window on Windows
+    )
 
 
 def buildGenerateScene(
@@ -454,7 +803,7 @@ def buildGenerateScene(
     """Builds new scene to generate thumbnails from using the selected
     renderer (arnold or redshift). Also works with 'both' command to build
     a scene that has the profiles and lights for both renderers.
-    Returns a string that can be run through the subprocess module or saved to a .bat file
+    Returns the command as an argument list for the subprocess module
     """
     missingThumbnailString = commaSeparatedList(missingThumbnailList)
     # Validate data
@@ -476,86 +825,116 @@ def buildGenerateScene(
             print(f"{renderer} is not a valid engine")
             return
 
-    maya_version = cmds.about(version=True)  # Year version of maya
-    env = os.environ.copy()
-
-    mayapyPath = f"C:/Program files/Autodesk/Maya{maya_version}/bin/mayapy.exe"
-
-    # Ensure mayapy is in expected location
-    if not os.path.isfile(mayapyPath):
-        cmds.confirmDialog(
-            message="mayapy not found at common installation location.\n\nPlease select the location of mayapy (usually in the /Autodesk/MayaXXXX/bin directory)"
-        )
-        mayapyPath = cmds.fileDialog2()
-        if not os.path.isfile(mayapyPath) or "mayapy.exe" not in mayapyPath:
-            cmds.warning("Not a valid path for mayapy.exe")
-            return None
-
-    command = f'"{mayapyPath}" {libraryDirectory}/IESmayaSceneSetup.py {missingThumbnailString} {libraryDirectory} {renderer} {renderFrames} {newScenePath}'
-
-    return command
-    # process = subprocess.Popen(command, env=env, shell=True, stdout=subprocess.PIPE) #,
-    # process.wait()
-    # return process
-
-
-def backgroundRender(
-    missingThumbnailList, libraryDirectory, renderer="arnold", camera="renderCam"
-) -> str:
-    """Builds command to start a subprocess to render a thumbnail scene.
-    Returns a string that can be directly ran, or saved to a .bat file."""
-
-    if libraryDirectory:
-        imageDirectory = libraryDirectory + "/IES_images/Temp/"
-    # Validate data
-    if len(missingThumbnailList) == 0:
-        print("List of missing thumbnails is empty")
-        return
-    if not imageDirectory and not os.path.isdir(imageDirectory):
-        print("Directory: " + str(os.path.isdir(imageDirectory)))
-        return
-    # Validate render engine and ensure it's in acceptable case
-    match renderer:
-        case "arnold" | "Arnold":
-            renderer = "arnold"
-        case "redshift" | "Redshift":
-            renderer = "redshift"
-        case _:
-            print(f"{renderer} is not a valid engine")
-            return None
-
-    maya_version = cmds.about(version=True)  # Year version of maya
-    endFrame = len(missingThumbnailList)
-    env = os.environ.copy()
-
-    renderEXE = f"C:/Program Files/Autodesk/Maya{maya_version}/bin/Render.exe"
-
-    # Ensure mayapy is in expected location
-    if not os.path.isfile(renderEXE):
-        cmds.confirmDialog(
-            message="Render.exe not found at common installation location.\n\nPlease select the location of Render.exe (usually in the /Autodesk/MayaXXXX/bin directory)"
-        )
-        renderEXE = cmds.fileDialog2()
-        if not os.path.isfile(renderEXE) or "Render.exe" not in renderEXE:
-            cmds.warning("Not a valid path for mayapy.exe")
-            return None
-
-    renderPrompt = f'"{renderEXE}" -r {renderer} -cam {camera} -s 1 -e {endFrame} -rd "{imageDirectory}" {libraryDirectory}/IESMakeThumbnails1.ma'
-
-    return renderPrompt
+    mayapyPath = mayaExecutable("mayapy")
+    if mayapyPath is None:
+        return None
+
+    return [
+        mayapyPath,
+        f"{libraryDirectory}/IESmayaSceneSetup.py",
+        missingThumbnailString,
+        libraryDirectory,
+        renderer,
+        str(renderFrames),
+        newScenePath,
+    ]
+
+
+def mayaExecutable(name: str) -> str:
+    """Returns the path of a program in Maya's bin folder ('mayapy' or 'Render'),
+    asks the user to locate it if it isn't next to the running Maya. Returns None
+    if no valid path was given."""
+    if platform.system() == "Windows":
+        name += ".exe"
+    binDirectories = [os.path.dirname(sys.executable)]
+    if os.environ.get("MAYA_LOCATION"):
+        binDirectories.insert(0, os.path.join(os.environ["MAYA_LOCATION"], "bin"))
+    for binDirectory in binDirectories:
+        executablePath = os.path.join(binDirectory, name)
+        if os.path.isfile(executablePath):
+            return executablePath
+
+    cmds.confirmDialog(
+        message=f"{name} not found next to Maya.\n\nPlease select the location of {name} (usually in the /Autodesk/MayaXXXX/bin directory)"
+    )
+    selection = cmds.fileDialog2(fileMode=1) or [""]
+    executablePath = selection[0]
+    if not os.path.isfile(executablePath) or name.split(".")[0].lower() not in os.path.basename(executablePath).lower():
+        cmds.warning(f"Not a valid path for {name}")
+        return None
+    return executablePath
+
+
+def groupMissingThumbnails(thumbnailsToRender) -> dict:
+    """Groups missing or outdated thumbnails by photometric duplicates. Profiles with a
+    duplicate that already has an up to date image get a copy of it straight away.
+    Returns profile to render -> list of its duplicates that reuse the rendered image."""
+    import iesDuplicates
+
+    profileFiles = {IESfile.split(".")[0]: IESfile for IESfile in IESFileList()}
+    duplicates = iesDuplicates.duplicateLookup(IESProfileData)
+    helpImage = IESLibraryDirectory + "/IES_images/help.png"
+
+    renderGroups = {}
+    handled = set()
+    copiedImages = []
+    for profileName in thumbnailsToRender:
+        if profileName in handled:
+            continue
+        # Broken profiles would fail mid-render, leave them out of the job
+        profile = IESProfileData.get(profileFiles.get(profileName))
+        if profile is None or not profile.isValid:
+            cmds.warning(f"Skipping thumbnail for {profileName}, the IES file has errors")
+            handled.add(profileName)
+            continue
+        group = duplicates.get(profileFiles.get(profileName), [])
+        groupNames = [IESfile.split(".")[0] for IESfile in group]
+        missingGroup = [name for name in groupNames if name in thumbnailsToRender]
+        handled.update(missingGroup or [profileName])
+
+        # Reuse an existing image of any duplicate in the group
+        existingImages = [
+            (name, IESImageFilePath(name)) for name in groupNames if name not in thumbnailsToRender
+        ]
+        existingImages = [(name, image) for name, image in existingImages if image != helpImage]
+        if existingImages:
+            sourceName, sourceImage = existingImages[0]
+            sourceEntry = thumbnailManifest["thumbnails"].get(sourceName)
+            for name in missingGroup:
+                linkOrCopy(sourceImage, f"{IESLibraryDirectory}/IES_images/{name}.png")
+                copiedImages.append(name)
+                # The copy is as up to date as its source
+                if sourceEntry:
+                    thumbnailManifest["thumbnails"][name] = dict(
+                        sourceEntry, hash=IESProfileData[profileFiles[name]].contentHash
+                    )
+            continue
+
+        if missingGroup:
+            renderGroups[missingGroup[0]] = missingGroup[1:]
+        else:
+            renderGroups[profileName] = []
 
+    if copiedImages:
+        updateCardImages(copiedImages)
+    saveThumbnailManifest()
+    return renderGroups
 
-def thumbnailCleanup(
-    duplicateFile=IESLibraryDirectory + "/IESMakeThumbnails1.ma",
-    sourceFolder=IESLibraryDirectory + "/IES_images/Temp",
-    destinationFolder=IESLibraryDirectory + "/IES_images",
-) -> str:
-    """Builds subprocess command to run cleanup script (used in bat file)"""
-    iesFileNames = commaSeparatedList(missingThumbnails)
 
-    command = f'python {IESLibraryDirectory}/cleanupFiles.py {IESLibraryDirectory} {duplicateFile} {sourceFolder} {destinationFolder} {iesFileNames}'
+def linkOrCopy(source: str, destination: str) -> None:
+    """Hard links 'source' to 'destination' to save disk space, copies the file
+    if links aren't supported (different drives, some network shares). An
+    existing outdated 'destination' is replaced."""
+    import shutil
 
-    return command
+    if os.path.exists(destination):
+        if os.path.samefile(source, destination):
+            return
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
 
 
 def clearDirectory(path: str) -> None:
@@ -698,32 +1077,40 @@ def buildCompatibleLightList(IESLightList, UI_LightList) -> None:
         cmds.textScrollList(UI_LightList, edit=True, append=IESLight)
 
 
-def createCardUI(IESfile, cardSize=128) -> str:
-    """Creates UI card for IES light and returns the cmds UI compenent as a string"""
-
-    profileName = IESfile.split(".")[0]
-    profileImagePath = IESImageFilePath(profileName)
-
-    # Add to missing list to generate missing images
-    if profileImagePath == IESLibraryDirectory + "/IES_images/help.png":
-        global missingThumbnails
-        missingThumbnails.append(profileName)
-
+def createCardUI(cardSize=128) -> tuple:
+    """Creates an empty UI card, filled by fillCardUI and reused from page to page.
+    Returns the cmds UI components of the card and its image as strings"""
     UI_card = cmds.rowLayout()
-
     UI_cardImage = cmds.iconTextButton(
         highlightColor=(0.5, 0.5, 0.5),
         scaleIcon=True,
         width=cardSize,
         height=cardSize + 16,
         style="iconAndTextVertical",
-        image1=profileImagePath,
-        label=profileName,
-        command=lambda: selectIESProfile(IESfile),
     )
     cmds.setParent("..")
 
-    return UI_cardImage
+    return UI_card, UI_cardImage
+
+
+def fillCardUI(UI_card, UI_cardImage, IESfile):
+    """Shows an IES light on a card with a placeholder image. Returns the request
+    that loads its thumbnail, None if the card already shows it at this size."""
+    profileName = IESfile.split(".")[0]
+    IESCards[IESfile] = UI_card
+    content = (IESfile, IESCardSize)
+    if IESCardContents.get(UI_cardImage) != content:
+        IESCardContents[UI_cardImage] = content
+        cmds.iconTextButton(
+            UI_cardImage,
+            edit=True,
+            label=profileName,
+            command=lambda: selectIESProfile(IESfile),
+            image1=IESPlaceholderImage,
+        )
+    if IESCardShown.get(UI_cardImage) == content:
+        return None
+    return cardImageRequest(UI_cardImage, IESfile)
 
 
 def selectIESProfile(IESProfile) -> None:
@@ -731,21 +1118,283 @@ def selectIESProfile(IESProfile) -> None:
     global selectedIESProfile
     global UI_selectedProfileLabel
     global UI_selectedProfileImage
+    global UI_selectedProfileInfo
 
-    profileImage = IESImageFilePath(IESProfile.split(".")[0])
+    profileImage = previewImagePath(IESProfile.split(".")[0])
 
     cmds.iconTextStaticLabel(UI_selectedProfileImage, edit=True, image=profileImage)
+    # The polar plot is only drawn while its tab is shown
+    if cmds.tabLayout(UI_previewTabs, query=True, selectTabIndex=True) == 2:
+        cmds.iconTextStaticLabel(
+            UI_selectedProfilePolar, edit=True, image=polarPlotFilePath(IESProfile)
+        )
     cmds.text(UI_selectedProfileLabel, edit=True, label=IESProfile)
+    cmds.text(UI_selectedProfileInfo, edit=True, label=profileDescription(IESProfile))
     selectedIESProfile = IESProfile
 
 
+def findMissingThumbnails() -> None:
+    """Lists the profiles that have no thumbnail image."""
+    global missingThumbnails
+    helpImage = IESLibraryDirectory + "/IES_images/help.png"
+    profileNames = [IESfile.split(".")[0] for IESfile in IESFileList()]
+    missingThumbnails = [
+        profileName for profileName in profileNames if IESImageFilePath(profileName) == helpImage
+    ]
+
+
 def IESImageFilePath(IESProfileName) -> str:
-    """Builds profile path and return it if valid, returns default '?' image if not."""
-    profilePath = IESLibraryDirectory + "/IES_images/" + IESProfileName + ".png"
-    if validPath(profilePath, True):
-        return profilePath
+    """Returns the profile's image path, matched without case against the image
+    index, returns default '?' image if it has none."""
+    imageName = imageIndex().find(IESProfileName + ".png")
+    if imageName is None:
+        return IESLibraryDirectory + "/IES_images/help.png"
+    return IESLibraryDirectory + "/IES_images/" + imageName
+
+
+def imageIndex():
+    """Snapshot of the IES_images folder, listed once and then kept up to date
+    by updateThumbnailsInBackground, so looking up images doesn't touch the disk."""
+    import libraryState
+
+    global IESImageState
+    if IESImageState is None or IESImageState.directory != IESLibraryDirectory + "/IES_images":
+        IESImageState = libraryState.LibraryState(IESLibraryDirectory + "/IES_images", ".png")
+        IESImageState.refresh()
+    return IESImageState
+
+
+def pyramidIndex(size):
+    """Snapshot of one thumbnail pyramid level, like imageIndex."""
+    import libraryState
+    import thumbnailPyramid
+
+    levelDirectory = f"{IESLibraryDirectory}/IES_cache/{thumbnailPyramid.PYRAMID_FOLDER}/{size}"
+    levelState = IESPyramidStates.get(size)
+    if levelState is None or levelState.directory != levelDirectory:
+        levelState = IESPyramidStates[size] = libraryState.LibraryState(levelDirectory, ".png")
+        levelState.refresh()
+    return levelState
+
+
+def pyramidImagePath(imagePath, displaySize) -> str:
+    """Returns the smallest scaled copy of a thumbnail that covers 'displaySize'
+    pixels, or the thumbnail itself if it hasn't been scaled yet."""
+    import thumbnailPyramid
+
+    imageName = os.path.splitext(os.path.basename(imagePath))[0]
+    size = thumbnailPyramid.levelSize(displaySize)
+    levelName = pyramidIndex(size).find(imageName + ".png")
+    if levelName is None:
+        return imagePath
+    return thumbnailPyramid.levelPath(
+        IESLibraryDirectory + "/IES_cache", size, os.path.splitext(levelName)[0]
+    )
+
+
+def cardImagePath(IESProfileName) -> str:
+    """Thumbnail of a profile at the current card size."""
+    return pyramidImagePath(IESImageFilePath(IESProfileName), IESCardSize)
+
+
+def previewImagePath(IESProfileName) -> str:
+    """Thumbnail of a profile at the size of the selected profile preview."""
+    return pyramidImagePath(IESImageFilePath(IESProfileName), 256)
+
+
+def qtModules():
+    """Returns (QtGui, QtWidgets, wrapInstance) from the PySide that ships
+    with Maya, None if Qt isn't available."""
+    try:
+        from PySide6 import QtGui, QtWidgets
+        from shiboken6 import wrapInstance
+    except ImportError:
+        try:
+            from PySide2 import QtGui, QtWidgets
+            from shiboken2 import wrapInstance
+        except ImportError:
+            return None
+    return QtGui, QtWidgets, wrapInstance
+
+
+def readThumbnailAtlas() -> None:
+    """Reads the atlas index for the current card size without packing anything,
+    updateThumbnailsInBackground packs new thumbnails."""
+    import thumbnailAtlas
+    import thumbnailPyramid
+
+    global IESAtlas
+    if not useThumbnailAtlas or qtModules() is None:
+        IESAtlas = None
+        return
+    IESAtlas = thumbnailAtlas.readIndex(
+        IESLibraryDirectory + "/IES_cache", thumbnailPyramid.levelSize(IESCardSize)
+    )
+    cardLoader().forgetPages()
+
+
+def updateThumbnailsInBackground(profileNames=None) -> None:
+    """Scales and packs new or changed thumbnails on a worker thread, so Maya
+    doesn't wait for them. Checks every image in IES_images unless
+    'profileNames' is given. The cards are updated once it's done.
+    IESThumbnailLock is only taken by these workers, so passes that overlap
+    take turns without ever blocking the UI."""
+    import maya.utils
+    import thumbnailAtlas
+    import thumbnailPyramid
+
+    # Keep the image index in step with the folder, only re-checking the given images
+    if profileNames is None:
+        images = {
+            os.path.splitext(imageName)[0]: modified / 1e9
+            for imageName, (_size, modified) in imageIndex().entries.items()
+        }
     else:
+        imageIndex().update([profileName + ".png" for profileName in profileNames])
+        profileNames = [
+            os.path.splitext(imageIndex().find(profileName + ".png") or profileName)[0]
+            for profileName in profileNames
+        ]
+        images = None
+
+    imageDirectory = IESLibraryDirectory + "/IES_images"
+    cacheDirectory = IESLibraryDirectory + "/IES_cache"
+    size = thumbnailPyramid.levelSize(IESCardSize)
+    packAtlas = IESAtlas is not None
+
+    def update():
+        with IESThumbnailLock:
+            updated = thumbnailPyramid.updatePyramid(
+                imageDirectory, cacheDirectory, names=profileNames, images=images
+            )
+            atlas = (
+                thumbnailAtlas.updateAtlas(cacheDirectory, size, names=profileNames) if packAtlas else None
+            )
+        maya.utils.executeDeferred(thumbnailsUpdated, updated, atlas, profileNames)
+
+    threading.Thread(target=update, daemon=True).start()
+
+
+def thumbnailsUpdated(updated, atlas, profileNames=None) -> None:
+    """Shows the thumbnails that were scaled and packed in the background,
+    refilling the page, or only the cards of 'profileNames' when given."""
+    import thumbnailAtlas
+    import thumbnailPyramid
+
+    global IESAtlas
+    for size in thumbnailPyramid.PYRAMID_SIZES:
+        if profileNames is None:
+            pyramidIndex(size).refresh()
+        else:
+            pyramidIndex(size).update([name + ".png" for name in updated])
+
+    # Pages are read again the next time a card on them is shown
+    if atlas is not None and atlas["size"] == thumbnailPyramid.levelSize(IESCardSize):
+        IESAtlas = atlas
+        if profileNames is None:
+            cardLoader().forgetPages()
+        else:
+            rects = [thumbnailAtlas.cellRect(IESAtlas, name) for name in profileNames]
+            cardLoader().forgetPages(
+                [
+                    thumbnailAtlas.pagePath(IESLibraryDirectory + "/IES_cache", atlas["size"], rect[0])
+                    for rect in rects
+                    if rect
+                ]
+            )
+
+    if profileNames is None:
+        if updated or atlas is not None:
+            IESCardShown.clear()
+            fillCardPage(IESCardList)
+        return
+
+    requests = []
+    for profileName in profileNames:
+        # Image names are matched without case, find the profile's real file name
+        IESfile = IESLibraryState.find(profileName + ".ies")
+        UI_card = IESCards.get(IESfile)
+        if UI_card is None or not cmds.rowLayout(UI_card, exists=True):
+            continue
+        UI_cardImage = cmds.rowLayout(UI_card, query=True, childArray=True)[0]
+        IESCardShown.pop(UI_cardImage, None)
+        requests.append(cardImageRequest(UI_cardImage, IESfile))
+    cardLoader().load(requests, replace=False)
+
+
+def cardLoader():
+    """The worker that loads card thumbnails, created on first use."""
+    import maya.utils
+    import thumbnailLoader
+
+    global IESCardLoader
+    if IESCardLoader is None:
+        qt = qtModules()
+        IESCardLoader = thumbnailLoader.ThumbnailLoader(
+            maya.utils.executeDeferred, showCardImage, qt[0] if qt else None
+        )
+    return IESCardLoader
+
+
+def cardImageRequest(UI_cardImage, IESfile) -> tuple:
+    """Request for the card loader to load a profile's thumbnail, cut from the
+    atlas when it's packed, otherwise from its card size image."""
+    import thumbnailAtlas
+
+    imagePath = cardImagePath(IESfile.split(".")[0])
+    source = imagePath
+    if IESAtlas is not None:
+        rect = thumbnailAtlas.cellRect(IESAtlas, os.path.splitext(os.path.basename(imagePath))[0])
+        if rect:
+            page, x, y, width, height = rect
+            pagePath = thumbnailAtlas.pagePath(IESLibraryDirectory + "/IES_cache", IESAtlas["size"], page)
+            source = (pagePath, x, y, width, height)
+    return (UI_cardImage, IESfile, IESCardSize), source, imagePath
+
+
+def showCardImage(key, image, imagePath) -> None:
+    """Shows a thumbnail loaded in the background on its card, unless the card
+    has moved on to another profile or size since it was requested."""
+    UI_cardImage, IESfile, cardSize = key
+    if IESCardContents.get(UI_cardImage) != (IESfile, cardSize):
+        return
+    if not cmds.iconTextButton(UI_cardImage, exists=True):
+        return
+    IESCardShown[UI_cardImage] = (IESfile, cardSize)
+
+    button = cardButton(UI_cardImage) if image is not None else None
+    if button is not None:
+        QtGui = qtModules()[0]
+        pixmap = QtGui.QPixmap.fromImage(image)
+        button.setIcon(QtGui.QIcon(pixmap))
+        button.setIconSize(pixmap.size() * (cardSize / max(pixmap.width(), pixmap.height())))
+        return
+    cmds.iconTextButton(UI_cardImage, edit=True, image1=imagePath)
+
+
+def cardButton(UI_cardImage):
+    """Qt button behind a card's iconTextButton, None if it isn't a Qt button."""
+    from maya import OpenMayaUI
+
+    QtGui, QtWidgets, wrapInstance = qtModules()
+    pointer = OpenMayaUI.MQtUtil.findControl(UI_cardImage)
+    if not pointer:
+        return None
+    if not wrapInstance(int(pointer), QtWidgets.QWidget).inherits("QAbstractButton"):
+        return None
+    return wrapInstance(int(pointer), QtWidgets.QAbstractButton)
+
+
+def polarPlotFilePath(IESfile) -> str:
+    """Returns the cached polar candela plot of a profile, drawing it first if needed.
+    Returns the default '?' image for files that couldn't be read."""
+    import iesPolar
+
+    profile = IESProfileData.get(IESfile)
+    if profile is None:
         return IESLibraryDirectory + "/IES_images/help.png"
+    plots = iesPolar.writePolarPlots({IESfile: profile}, IESLibraryDirectory + "/IES_cache")
+    return plots[IESfile]
 
 
 def getCurrentRenderer() -> str:
@@ -779,12 +1428,225 @@ def getCurrentRenderer() -> str:
 
 
 def IESFileList() -> list:
-    """Return list of IES files to use in library"""
+    """Return list of IES files to use in library from the current library snapshot.
+    Use refreshLibrary() to pick up changes on disk."""
+
+    if IESLibraryState is None:
+        return cmds.getFileList(
+            filespec="*.ies", folder=IESLibraryDirectory + "/IES_files"
+        ) or []
+    return IESLibraryState.names()
+
+
+def sortedFileList() -> list:
+    """Returns the IES files in the order chosen in the browser's sort menu.
+    Profiles missing from the catalog (unreadable files) are listed last."""
+    import iesCatalog
+
+    IESfiles = IESFileList()
+    column, descending = IESSortOptions[IESSortBy]
+    if column == "name" or IESCatalog is None:
+        return IESfiles
+
+    order = iesCatalog.queryCatalog(IESCatalog, "", column, descending)
+    rank = {IESfile: i for i, IESfile in enumerate(order)}
+    return sorted(IESfiles, key=lambda IESfile: rank.get(IESfile, len(rank)))
+
+
+def sortProfileCards(sortLabel, parentLayout, UI_columns) -> None:
+    """Shows the profile cards in the order of the chosen sort option."""
+    global IESSortBy
+    IESSortBy = sortLabel
+    filterProfileCards(IESSearch)
+
+
+def refreshLibrary() -> None:
+    """Rescans the IES files folder and only updates the cards of profiles that
+    were added, removed or changed since the last scan."""
+    import iesCatalog
+
+    global IESProfileData, IESSimilarity
+
+    loadThumbnailManifest()
+    imageIndex().refresh()
+    updateThumbnailsInBackground()
+    findMissingThumbnails()
+    IESCardShown.clear()
+    changes = IESLibraryState.refresh()
+    if not (changes.added or changes.removed or changes.changed):
+        # Thumbnails may still have changed
+        fillCardPage(IESCardList)
+        return
+
+    IESProfileData = loadIESProfiles()
+    IESSimilarity = None
+    iesCatalog.updateCatalog(IESCatalog, IESProfileData, IESLibraryDirectory + "/IES_files")
+    findMissingThumbnails()
 
-    IESLibraryList = cmds.getFileList(
-        filespec="*.ies", folder=IESLibraryDirectory + "/IES_files"
+    # The cards are refilled with the new list, staying on the same page
+    page = IESCardPage
+    filterProfileCards(IESSearch)
+    showCardPage(page)
+
+
+def loadIESProfiles() -> dict:
+    """Returns photometric data for every IES file in the library, keyed by file name.
+    Uses the binary profile cache so files are only parsed when they change."""
+    import iesCache
+
+    snapshot = None if IESLibraryState is None else IESLibraryState.entries
+    return iesCache.loadProfiles(IESLibraryDirectory + "/IES_files", snapshot=snapshot)
+
+
+def loadIESCatalog(profiles):
+    """Opens the library's search catalog and adds any new or changed profiles to it."""
+    import iesCatalog
+
+    catalog = iesCatalog.openCatalog(
+        IESLibraryDirectory + "/IES_cache/" + iesCatalog.CATALOG_NAME
     )
-    return IESLibraryList
+    iesCatalog.updateCatalog(catalog, profiles, IESLibraryDirectory + "/IES_files")
+    return catalog
+
+
+def loadThumbnailManifest() -> None:
+    """Reads the thumbnail manifest and records background renders that finished since it was saved."""
+    import thumbnailManifest as manifestModule
+
+    global thumbnailManifest
+    cacheDirectory = IESLibraryDirectory + "/IES_cache"
+    thumbnailManifest = manifestModule.readManifest(cacheDirectory)
+    if manifestModule.settleThumbnails(thumbnailManifest, IESLibraryDirectory + "/IES_images"):
+        manifestModule.writeManifest(cacheDirectory, thumbnailManifest)
+
+
+def saveThumbnailManifest() -> None:
+    import thumbnailManifest as manifestModule
+
+    manifestModule.writeManifest(IESLibraryDirectory + "/IES_cache", thumbnailManifest)
+
+
+def thumbnailSettings() -> dict:
+    """Returns renderer -> (scene version, settings) that thumbnails rendered now would use."""
+    import iesRender
+    import thumbnailManifest as manifestModule
+
+    sceneVersion = manifestModule.sceneVersion(IESLibraryDirectory + "/IESMakeThumbnails.ma")
+    return {
+        "arnold": (sceneVersion, {}),
+        "redshift": (sceneVersion, {}),
+        "analytic": (iesRender.SCENE_VERSION, {"size": iesRender.THUMBNAIL_SIZE}),
+    }
+
+
+def outdatedThumbnails() -> list:
+    """Returns the names of profiles with a missing thumbnail, followed by the
+    profiles whose file, render settings or scene changed since it was rendered."""
+    import thumbnailManifest as manifestModule
+
+    profileHashes = {
+        IESfile.split(".")[0]: profile.contentHash for IESfile, profile in IESProfileData.items()
+    }
+    stale = manifestModule.staleThumbnails(thumbnailManifest, profileHashes, thumbnailSettings())
+    return list(missingThumbnails) + [name for name in stale if name not in missingThumbnails]
+
+
+def thumbnailJobEntries(renderer) -> dict:
+    """Returns the manifest entries of every image the current thumbnail job writes."""
+    import thumbnailManifest as manifestModule
+
+    profileFiles = {IESfile.split(".")[0]: IESfile for IESfile in IESFileList()}
+    scene, settings = thumbnailSettings()[renderer]
+    entries = {}
+    for profileName, duplicates in thumbnailDuplicates.items():
+        for name in [profileName] + duplicates:
+            profileHash = IESProfileData[profileFiles[name]].contentHash
+            entries[name] = manifestModule.thumbnailEntry(profileHash, renderer, scene, settings)
+    return entries
+
+
+def queueThumbnailJob(renderer) -> None:
+    """Marks the thumbnails of a background render as pending in the manifest."""
+    import thumbnailManifest as manifestModule
+
+    manifestModule.queueThumbnails(thumbnailManifest, thumbnailJobEntries(renderer))
+    saveThumbnailManifest()
+
+
+def recordThumbnailJob(renderer) -> None:
+    """Records the thumbnails of a finished render in the manifest."""
+    import thumbnailManifest as manifestModule
+
+    manifestModule.recordThumbnails(thumbnailManifest, thumbnailJobEntries(renderer))
+    saveThumbnailManifest()
+
+
+def filterProfileCards(search: str) -> None:
+    """Shows only the profile cards matching the search string, shows every card if it's empty."""
+    import iesCatalog
+
+    global IESSearch
+    IESSearch = search
+
+    if search.strip():
+        showOnlyCards(iesCatalog.queryCatalog(IESCatalog, search))
+    else:
+        showOnlyCards(IESFileList())
+
+
+def showOnlyCards(IESfiles, ordered=False) -> None:
+    """Pages through the cards of the given IES files, starting from the first
+    page. They're shown in the chosen sort order, or as given if 'ordered'."""
+    global IESShownFiles
+    if ordered:
+        IESShownFiles = [IESfile for IESfile in IESfiles if IESfile in IESProfileData]
+    else:
+        matches = set(IESfiles)
+        IESShownFiles = [IESfile for IESfile in sortedFileList() if IESfile in matches]
+    showCardPage(0)
+
+
+def showSimilarProfiles(count=12) -> None:
+    """Only shows the selected profile and the profiles with the most similar light distribution."""
+    import iesSimilarity
+
+    global IESSimilarity, IESSearch
+    if IESSimilarity is None:
+        IESSimilarity = iesSimilarity.buildSimilarityIndex(
+            IESProfileData, IESLibraryDirectory + "/IES_cache"
+        )
+
+    matches = IESSimilarity.similar(selectedIESProfile, count)
+    if not matches:
+        cmds.warning(f"No similar profiles found for {selectedIESProfile}")
+        return
+
+    # Similar profiles replace the text search, clear the field so it's not confusing
+    IESSearch = ""
+    cmds.textField(UI_searchField, edit=True, text="")
+    # Closest matches first, rather than in the browser's sort order
+    showOnlyCards([selectedIESProfile] + [IESfile for IESfile, _score in matches], ordered=True)
+
+
+def profileDescription(IESfile) -> str:
+    """Returns a short summary of a profile's photometric data for the preview."""
+    profile = IESProfileData.get(IESfile)
+    if profile is None:
+        return ""
+
+    details = []
+    manufacturer = profile.keyword("MANUFAC")
+    if manufacturer:
+        details.append(manufacturer)
+    if profile.lumens > 0:
+        details.append(f"{profile.lumens:g} lm")
+    if profile.inputWatts > 0:
+        details.append(f"{profile.inputWatts:g} W")
+    details.append(f"{profile.peakCandela:.0f} cd peak")
+    description = " | ".join(details)
+    for severity, message in profile.issues:
+        description += f"\n{severity.capitalize()}: {message}"
+    return description
 
 
 def createLight() -> None:
@@ -908,6 +1770,12 @@ def checkIESDirectory() -> None:
             sys.exit()
 
 
+def addLibraryToPath() -> None:
+    """Makes the tool's modules (iesProfile, iesCache...) importable from the library directory."""
+    if IESLibraryDirectory not in sys.path:
+        sys.path.append(IESLibraryDirectory)
+
+
 def killAllJobs(jobList) -> None:
     """Kills list of active jobs. Used when closing the window"""
     for job in jobList:
@@ -923,5 +1791,6 @@ def killAllJobs(jobList) -> None:
 if __name__ == "__main__":
     # Ensure saved directory is still valid
     checkIESDirectory()
+    addLibraryToPath()
     # Create window
     createIESWindow()
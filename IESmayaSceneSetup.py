@@ -5,6 +5,8 @@ import maya.cmds as cmds
 import sys
 import os
 
+import iesFrameSwitch
+
 maya.standalone.initialize(name='python')
 
 iesFiles = sys.argv[1].split(",")
@@ -12,6 +14,9 @@ IESLibraryDirectory = sys.argv[2]
 renderEngine = sys.argv[3]
 processImages = sys.argv[4]
 newScenePath = sys.argv[5]
+# "switch" keeps one light per renderer and changes its profile every frame,
+# "duplicate" adds a light per profile so the scene can be scrubbed by hand
+lightMode = sys.argv[6] if len(sys.argv) > 6 else ("duplicate" if renderEngine in ("both", "Both") else "switch")
 IESImageDirectory = IESLibraryDirectory + "/IES_images/"
 #iesFiles = cmds.getFileList(filespec="*.ies",folder=IESLibraryDirectory+"/IES_files")
 camera = "renderCam"
@@ -91,6 +96,19 @@ def createLights(defaultLightName, iesAttr, iesFilesList):
         cmds.setKeyframe(newLight, attribute='visibility', t=frame, v=True)
         cmds.setKeyframe(newLight, attribute='visibility', t=frame+1, v=False)
 
+def switchLights(lights, iesFilesList):
+    """Uses one light per renderer for every IES file. 'lights' is light
+    shape -> IES attribute, the profiles are written to a frame list that
+    a pre-render-frame callback reads, so the scene doesn't grow with the list"""
+    profilePaths = [IESLibraryDirectory+"/IES_files/"+iesFile+".ies" for iesFile in iesFilesList]
+    framesPath = iesFrameSwitch.frameListPath(IESLibraryDirectory+newScenePath)
+    iesFrameSwitch.writeFrameList(framesPath, lights, profilePaths)
+
+    for lightShape, iesAttr in lights.items():
+        cmds.setAttr(f"{lightShape}.{iesAttr}", profilePaths[0], type="string")
+        cmds.setAttr(cmds.listRelatives(lightShape, parent=True)[0] + ".visibility", True)
+    cmds.setAttr("defaultRenderGlobals.preRenderMel", iesFrameSwitch.preRenderCommand(IESLibraryDirectory, framesPath), type="string")
+
 match renderEngine:
     case "arnold" | "Arnold":
         renderEngine = "arnold"
@@ -101,7 +119,10 @@ match renderEngine:
         prerender_Arnoldsettings("iesLight_", IESImageDirectory, camera, 1, len(iesFiles))
 
         # Create lights for missing thumbnail profiles
-        createLights("aiPhotometricLight", "aiFilename", iesFiles)
+        if lightMode == "switch":
+            switchLights({"aiPhotometricLightShape": "aiFilename"}, iesFiles)
+        else:
+            createLights("aiPhotometricLight", "aiFilename", iesFiles)
     case "redshift" | "Redshift":
         renderEngine = "redshift"
         cmds.setAttr("ArnoldLayer.visibility", False)
@@ -111,13 +132,19 @@ match renderEngine:
         prerender_Redshiftsettings("iesLight_", IESImageDirectory, camera, 1, len(iesFiles))
 
         # Create lights for missing thumbnail profiles
-        createLights("rsIESLight", "profile", iesFiles)
+        if lightMode == "switch":
+            switchLights({"rsIESLightShape": "profile"}, iesFiles)
+        else:
+            createLights("rsIESLight", "profile", iesFiles)
     case "both" | "Both":
         cmds.setAttr("ArnoldLayer.visibility", True)
         cmds.setAttr("RedshiftLayer.visibility", True)
-        
-        createLights("aiPhotometricLight", "aiFilename", iesFiles)
-        createLights("rsIESLight", "profile", iesFiles)
+
+        if lightMode == "switch":
+            switchLights({"aiPhotometricLightShape": "aiFilename", "rsIESLightShape": "profile"}, iesFiles)
+        else:
+            createLights("aiPhotometricLight", "aiFilename", iesFiles)
+            createLights("rsIESLight", "profile", iesFiles)
     case _:
         pass
 
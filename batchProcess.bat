@@ -1,4 +0,0 @@
-"C:/Program files/Autodesk/Maya2024/bin/mayapy.exe" C:/Users/gnlco/Documents/School/1_Advanced_scripting/IES_Library/IESmayaSceneSetup.py potlight_02 C:/Users/gnlco/Documents/School/1_Advanced_scripting/IES_Library redshift True /IESMakeThumbnails1.ma
-"C:/Program Files/Autodesk/Maya2024/bin/Render.exe" -r redshift -cam renderCam -s 1 -e 1 -rd "C:/Users/gnlco/Documents/School/1_Advanced_scripting/IES_Library/IES_images/Temp/" C:/Users/gnlco/Documents/School/1_Advanced_scripting/IES_Library/IESMakeThumbnails1.ma
-python C:/Users/gnlco/Documents/School/1_Advanced_scripting/IES_Library/cleanupFiles.py C:/Users/gnlco/Documents/School/1_Advanced_scripting/IES_Library C:/Users/gnlco/Documents/School/1_Advanced_scripting/IES_Library/IESMakeThumbnails1.ma C:/Users/gnlco/Documents/School/1_Advanced_scripting/IES_Library/IES_images/Temp C:/Users/gnlco/Documents/School/1_Advanced_scripting/IES_Library/IES_images potlight_02
-python C:/Users/gnlco/Documents/School/1_Advanced_scripting/IES_Library\windowsNotification.py
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""Persistent binary cache of parsed IES profiles.
+
+All angle and candela arrays of a library are packed into one float32 .npy
+blob which is memory-mapped on load, so profiles are rebuilt as zero-copy
+views. Duplicate profiles with identical arrays are stored once. A small
+JSON index stores the header data and offsets of each profile along with
+its iesMetrics values and lint issues. Entries are reused while the file
+size and modification time match, and files whose stat changed are only
+re-parsed if their content hash changed as well.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+import iesMetrics
+import iesProfile
+import libraryState
+
+CACHE_VERSION = 7
+INDEX_NAME = "index.json"
+
+# Scalar IESProfile fields stored in the index
+headerFields = (
+    "format",
+    "tilt",
+    "lamps",
+    "lumensPerLamp",
+    "multiplier",
+    "photometricType",
+    "units",
+    "width",
+    "length",
+    "height",
+    "ballastFactor",
+    "inputWatts",
+    "symmetry",
+)
+
+
+def defaultCacheDirectory(iesDirectory: str) -> str:
+    """Returns the cache folder that sits next to the IES files folder."""
+    return os.path.join(os.path.dirname(os.path.normpath(iesDirectory)), "IES_cache")
+
+
+def readIndex(cacheDirectory: str) -> dict:
+    """Reads the cache index, returns an empty index if it is missing or outdated."""
+    emptyIndex = {"version": CACHE_VERSION, "blob": "", "profiles": {}}
+    try:
+        with open(os.path.join(cacheDirectory, INDEX_NAME), "r") as indexFile:
+            index = json.load(indexFile)
+    except (OSError, ValueError):
+        return emptyIndex
+    if index.get("version") != CACHE_VERSION:
+        return emptyIndex
+    return index
+
+
+def profileFromEntry(name: str, path: str, entry: dict, blob) -> iesProfile.IESProfile:
+    """Rebuilds a profile from its index entry using views into the blob."""
+    profile = iesProfile.IESProfile(name, path)
+    profile.contentHash = entry["hash"]
+    for field in headerFields:
+        setattr(profile, field, entry["header"][field])
+    profile.keywords = entry["keywords"]
+    profile.metrics = entry["metrics"]
+    profile.issues = [tuple(issue) for issue in entry["issues"]]
+
+    offset = entry["offset"]
+    vertical, horizontal, tiltPairs = entry["shape"]
+    profile.verticalAngles = blob[offset : offset + vertical]
+    offset += vertical
+    profile.horizontalAngles = blob[offset : offset + horizontal]
+    offset += horizontal
+    profile.candela = blob[offset : offset + horizontal * vertical].reshape(
+        horizontal, vertical
+    )
+    offset += horizontal * vertical
+    if tiltPairs:
+        profile.tiltAngles = blob[offset : offset + tiltPairs]
+        profile.tiltFactors = blob[offset + tiltPairs : offset + 2 * tiltPairs]
+    return profile
+
+
+def entryFromProfile(profile: iesProfile.IESProfile, size: int, mtime: int) -> dict:
+    """Builds the index entry of a profile, offsets are set when writing the blob."""
+    tiltPairs = 0 if profile.tiltAngles is None else len(profile.tiltAngles)
+    return {
+        "size": size,
+        "mtime": mtime,
+        "hash": profile.contentHash,
+        "header": {field: getattr(profile, field) for field in headerFields},
+        "keywords": profile.keywords,
+        "metrics": profile.metrics,
+        "issues": profile.issues,
+        "offset": 0,
+        "shape": [len(profile.verticalAngles), len(profile.horizontalAngles), tiltPairs],
+    }
+
+
+def profileArrays(profile: iesProfile.IESProfile) -> list:
+    """Returns the arrays of a profile in the order they are stored in the blob."""
+    arrays = [profile.verticalAngles, profile.horizontalAngles, profile.candela.ravel()]
+    if profile.tiltAngles is not None:
+        arrays += [profile.tiltAngles, profile.tiltFactors]
+    return arrays
+
+
+def writeCache(cacheDirectory: str, index: dict, profiles: dict) -> None:
+    """Writes a new blob and index for 'profiles'. A new blob file is used for
+    each write so a blob still memory-mapped by a running session is never
+    overwritten."""
+    os.makedirs(cacheDirectory, exist_ok=True)
+
+    arrays = []
+    offset = 0
+    payloadOffsets = {}
+    for name, profile in profiles.items():
+        # Profiles with identical photometric arrays share their storage
+        profileData = [np.asarray(array, dtype=np.float32) for array in profileArrays(profile)]
+        payload = hashlib.blake2b(digest_size=16)
+        payload.update(str(index["profiles"][name]["shape"]).encode())
+        for array in profileData:
+            payload.update(array.tobytes())
+        payloadKey = payload.digest()
+        if payloadKey in payloadOffsets:
+            index["profiles"][name]["offset"] = payloadOffsets[payloadKey]
+            continue
+
+        payloadOffsets[payloadKey] = offset
+        index["profiles"][name]["offset"] = offset
+        for array in profileData:
+            arrays.append(array)
+            offset += len(array)
+    blob = np.concatenate(arrays).astype(np.float32) if arrays else np.zeros(0, np.float32)
+
+    oldBlob = index.get("blob", "")
+    generation = 0
+    if oldBlob:
+        generation = int(oldBlob.split("_")[-1].split(".")[0]) + 1
+    blobName = f"profiles_{generation}.npy"
+    np.save(os.path.join(cacheDirectory, blobName), blob)
+
+    index["blob"] = blobName
+    temporaryIndex = os.path.join(cacheDirectory, INDEX_NAME + ".tmp")
+    with open(temporaryIndex, "w") as indexFile:
+        json.dump(index, indexFile)
+    os.replace(temporaryIndex, os.path.join(cacheDirectory, INDEX_NAME))
+
+    # Remove old blobs, ones still mapped on Windows are removed next time
+    for entry in os.scandir(cacheDirectory):
+        if entry.name.startswith("profiles_") and entry.name != blobName:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def loadProfiles(iesDirectory: str, cacheDirectory: str = None, snapshot: dict = None) -> dict:
+    """Returns a dictionary of file name to IESProfile for every .ies file in
+    'iesDirectory', reading from the cache and updating it when files were
+    added, removed or changed. 'snapshot' is an existing LibraryState scan
+    (file name -> (size, mtime)) and avoids listing the folder again."""
+
+    cacheDirectory = cacheDirectory or defaultCacheDirectory(iesDirectory)
+    index = readIndex(cacheDirectory)
+    cachedEntries = index["profiles"]
+
+    blob = None
+    if index["blob"]:
+        try:
+            blob = np.load(os.path.join(cacheDirectory, index["blob"]), mmap_mode="r")
+        except (OSError, ValueError):
+            cachedEntries = {}
+
+    if snapshot is None:
+        snapshot = libraryState.LibraryState(iesDirectory).scan()
+
+    profiles = {}
+    entries = {}
+    parsed = {}
+    changed = False
+    for name in sorted(snapshot):
+        size, mtime = snapshot[name]
+        path = os.path.join(iesDirectory, name)
+        cached = cachedEntries.get(name)
+
+        if cached and cached["size"] == size and cached["mtime"] == mtime:
+            entries[name] = cached
+            if "error" not in cached:
+                profiles[name] = profileFromEntry(name, path, cached, blob)
+            continue
+
+        # Stat changed or not cached yet, compare content before re-parsing
+        try:
+            with open(path, "rb") as iesFile:
+                data = iesFile.read()
+        except OSError:
+            continue
+        dataHash = iesProfile.contentHash(data)
+        changed = True
+        if cached and cached["hash"] == dataHash:
+            cached["size"] = size
+            cached["mtime"] = mtime
+            entries[name] = cached
+            if "error" not in cached:
+                profiles[name] = profileFromEntry(name, path, cached, blob)
+            continue
+
+        try:
+            profile = iesProfile.parseIESBytes(data, name, path)
+        except iesProfile.IESParseError as error:
+            # Remember broken files so they aren't re-read every load
+            print(error)
+            entries[name] = {"size": size, "mtime": mtime, "hash": dataHash, "error": str(error)}
+            continue
+        profiles[name] = profile
+        parsed[name] = (size, mtime)
+
+    # Metrics of new or changed profiles are computed together in one batch
+    if parsed:
+        newMetrics = iesMetrics.libraryMetrics({name: profiles[name] for name in parsed})
+        for name, (size, mtime) in parsed.items():
+            profiles[name].metrics = newMetrics[name]
+            entries[name] = entryFromProfile(profiles[name], size, mtime)
+
+    if changed or entries.keys() != cachedEntries.keys():
+        index["profiles"] = entries
+        writeCache(cacheDirectory, index, profiles)
+
+    return profiles
@@ -0,0 +1,219 @@
+"""SQLite catalog of IES profile metadata used to search and filter the library.
+
+Search strings mix free text with field filters, for example
+'halo beam<40' or 'manufacturer=bega lumens>=1000'. Text filters match the
+start of the field and ignore case, free text matches anywhere in the
+name, manufacturer, catalog number, luminaire or lamp description.
+"""
+
+import os
+import re
+import sqlite3
+
+import iesMetrics
+
+CATALOG_NAME = "catalog.sqlite"
+CATALOG_VERSION = 5
+
+schema = """
+CREATE TABLE IF NOT EXISTS profiles (
+    name TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    manufacturer TEXT COLLATE NOCASE,
+    lumcat TEXT COLLATE NOCASE,
+    luminaire TEXT COLLATE NOCASE,
+    lamp TEXT COLLATE NOCASE,
+    lumens REAL,
+    inputWatts REAL,
+    beamAngle REAL,
+    fieldAngle REAL,
+    photometricType INTEGER,
+    output REAL,
+    peakCandela REAL,
+    efficacy REAL,
+    spacingCriterion REAL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (source, name)
+);
+CREATE INDEX IF NOT EXISTS profilesManufacturer ON profiles (manufacturer);
+CREATE INDEX IF NOT EXISTS profilesBeam ON profiles (beamAngle);
+CREATE INDEX IF NOT EXISTS profilesLumens ON profiles (lumens);
+CREATE INDEX IF NOT EXISTS profilesName ON profiles (name);
+"""
+
+# Search field names and the catalog column they filter
+searchFields = {
+    "name": "name",
+    "manufacturer": "manufacturer",
+    "manufac": "manufacturer",
+    "lumcat": "lumcat",
+    "luminaire": "luminaire",
+    "lamp": "lamp",
+    "lumens": "lumens",
+    "watts": "inputWatts",
+    "beam": "beamAngle",
+    "field": "fieldAngle",
+    "type": "photometricType",
+    "output": "output",
+    "peak": "peakCandela",
+    "efficacy": "efficacy",
+    "spacing": "spacingCriterion",
+}
+textColumns = ("name", "manufacturer", "lumcat", "luminaire", "lamp")
+filterPattern = re.compile(r'(\w+)\s*(<=|>=|=|<|>)\s*("[^"]*"|\S+)')
+
+
+def openCatalog(path: str) -> sqlite3.Connection:
+    """Opens (and creates if needed) the catalog database at 'path'."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path)
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version == 4:
+        # Version 4 rows already record their source, only the key changed
+        with connection:
+            connection.execute("DROP INDEX IF EXISTS profilesSource")
+            connection.execute("ALTER TABLE profiles RENAME TO profilesVersion4")
+            connection.executescript(schema)
+            connection.execute("INSERT OR REPLACE INTO profiles SELECT * FROM profilesVersion4")
+            connection.execute("DROP TABLE profilesVersion4")
+            connection.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+    elif version != CATALOG_VERSION:
+        # Older catalogs are rebuilt from scratch
+        connection.execute("DROP TABLE IF EXISTS profiles")
+        connection.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+    connection.executescript(schema)
+    return connection
+
+
+def sourceKey(path: str) -> str:
+    """Identifies the folder or zip file that catalog rows were read from."""
+    return os.path.normcase(os.path.abspath(path)).replace("\\", "/")
+
+
+def catalogRow(name: str, profile, metrics: dict, source: str) -> tuple:
+    """Returns the catalog row for a profile and its iesMetrics values.
+    'source' is the sourceKey() of the folder or zip file it was read from."""
+    return (
+        name,
+        profile.contentHash,
+        profile.keyword("MANUFAC"),
+        profile.keyword("LUMCAT"),
+        profile.keyword("LUMINAIRE"),
+        profile.keyword("LAMP"),
+        profile.lumens,
+        profile.inputWatts,
+        metrics["beamAngle"],
+        metrics["fieldAngle"],
+        profile.photometricType,
+        metrics["lumens"],
+        metrics["peakCandela"],
+        metrics["efficacy"],
+        metrics["spacingCriterion"],
+        source,
+    )
+
+
+def updateCatalog(connection: sqlite3.Connection, profiles: dict, source: str) -> int:
+    """Brings the catalog rows read from the 'source' folder in line with
+    'profiles' (file name -> IESProfile), rows of other sources are left
+    alone. Only new or changed profiles are written. Returns the number of
+    rows changed."""
+
+    source = sourceKey(source)
+    catalogHashes = knownHashes(connection, source)
+
+    changed = {
+        name: profile
+        for name, profile in profiles.items()
+        if catalogHashes.get(name) != profile.contentHash
+    }
+    # Use metrics cached with the profiles, compute the rest in one batch
+    missing = {name: profile for name, profile in changed.items() if profile.metrics is None}
+    metrics = iesMetrics.libraryMetrics(missing) if missing else {}
+    rows = [
+        catalogRow(name, profile, profile.metrics or metrics[name], source)
+        for name, profile in changed.items()
+    ]
+    removed = [name for name in catalogHashes if name not in profiles]
+
+    writeRows(connection, rows)
+    removeRows(connection, removed, source)
+    return len(rows) + len(removed)
+
+
+def knownHashes(connection: sqlite3.Connection, source: str) -> dict:
+    """Returns file name -> content hash of every profile read from 'source'."""
+    return dict(connection.execute("SELECT name, hash FROM profiles WHERE source = ?", (source,)))
+
+
+def writeRows(connection: sqlite3.Connection, rows: list) -> None:
+    """Adds or replaces catalog rows built with catalogRow() in one transaction."""
+    with connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+def removeRows(connection: sqlite3.Connection, names: list, source: str) -> None:
+    """Removes the profiles of one source from the catalog by file name.
+    'source' is a sourceKey(), profiles of the same name from other sources are kept."""
+    with connection:
+        connection.executemany(
+            "DELETE FROM profiles WHERE source = ? AND name = ?", [(source, name) for name in names]
+        )
+
+
+def parseSearch(search: str) -> tuple:
+    """Converts a search string into an SQL where clause and its parameters."""
+    clauses = []
+    parameters = []
+
+    for field, operator, value in filterPattern.findall(search):
+        column = searchFields.get(field.lower())
+        if column is None:
+            continue
+        value = value.strip('"')
+        if column in textColumns:
+            clauses.append(f"{column} LIKE ? ESCAPE '\\'")
+            parameters.append(escapeLike(value) + "%")
+        else:
+            try:
+                number = float(value.rstrip("°"))
+            except ValueError:
+                continue
+            clauses.append(f"{column} {operator} ?")
+            parameters.append(number)
+
+    # Anything that isn't a field filter is free text, 'and' joins filters
+    for word in filterPattern.sub(" ", search).split():
+        if word.lower() == "and":
+            continue
+        pattern = "%" + escapeLike(word) + "%"
+        clauses.append(
+            "(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in textColumns) + ")"
+        )
+        parameters.extend([pattern] * len(textColumns))
+
+    where = " AND ".join(clauses) or "1"
+    return where, parameters
+
+
+def escapeLike(value: str) -> str:
+    """Escapes LIKE wildcards in user input."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def queryCatalog(
+    connection: sqlite3.Connection, search: str = "", orderBy: str = "name", descending=False
+) -> list:
+    """Returns the file names of profiles matching 'search', sorted by the catalog column 'orderBy'."""
+    if orderBy not in searchFields.values():
+        orderBy = "name"
+    direction = "DESC" if descending else "ASC"
+    where, parameters = parseSearch(search)
+    cursor = connection.execute(
+        f"SELECT name FROM profiles WHERE {where} ORDER BY {orderBy} {direction}, name",
+        parameters,
+    )
+    return [row[0] for row in cursor]
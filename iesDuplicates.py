@@ -0,0 +1,134 @@
+"""Detects IES profiles that contain the same photometric data.
+
+Vendor packs often ship one measurement under several file names with
+different headers or formatting. Profiles are compared by their photometric
+payload only (photometric type, angles and candela values), so whitespace,
+line endings and header keywords are ignored. Exact duplicates share a hash
+of the payload. Near-exact duplicates are found among profiles with the
+same photometric type and grid size, by comparing their candela values
+relative to the peak within a tolerance.
+"""
+
+import hashlib
+
+import numpy as np
+
+# Relative candela tolerance used for near-exact duplicates
+NEAR_TOLERANCE = 1e-3
+
+# Angles closer than this (degrees) are the same angle
+ANGLE_TOLERANCE = 0.01
+
+
+def payloadHash(profile) -> str:
+    """Hashes the photometric payload of a profile, for exact duplicates."""
+    payload = hashlib.blake2b(digest_size=16)
+    payload.update(np.array([profile.photometricType], dtype=np.float64).tobytes())
+    for array in (profile.verticalAngles, profile.horizontalAngles, profile.candela):
+        array = np.asarray(array)
+        payload.update(np.int64(array.size).tobytes())
+        payload.update(np.ascontiguousarray(array, dtype=np.float32).tobytes())
+    return payload.hexdigest()
+
+
+def candidateKey(profile) -> tuple:
+    """Profiles can only be near duplicates if they share this key."""
+    return (
+        profile.photometricType,
+        len(profile.verticalAngles),
+        len(profile.horizontalAngles),
+    )
+
+
+def nearGroups(names: list, profiles: dict, tolerance: float) -> list:
+    """Groups profiles that share a candidate key when their peaks and
+    candela values relative to the peak differ by at most 'tolerance', and
+    their angles by at most ANGLE_TOLERANCE.
+
+    The profiles are sorted by the sum of their relative candela values, which
+    can only differ by 'tolerance' per value between duplicates, so each one
+    is compared with its neighbours in that order rather than with every
+    other profile."""
+    peaks = np.array([float(np.max(profiles[name].candela)) for name in names])
+    relative = np.stack(
+        [
+            np.asarray(profiles[name].candela, np.float64).ravel() / (peak if peak > 0 else 1.0)
+            for name, peak in zip(names, peaks)
+        ]
+    )
+    angles = np.stack(
+        [
+            np.concatenate(
+                (
+                    np.asarray(profiles[name].verticalAngles, np.float64),
+                    np.asarray(profiles[name].horizontalAngles, np.float64),
+                )
+            )
+            for name in names
+        ]
+    )
+    sums = relative.sum(axis=1)
+    window = tolerance * relative.shape[1]
+    order = np.argsort(sums, kind="stable")
+
+    # Duplicates of duplicates end up in the same group
+    parent = list(range(len(names)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for position, i in enumerate(order):
+        end = np.searchsorted(sums[order], sums[i] + window, side="right")
+        neighbours = order[position + 1 : end]
+        if len(neighbours) == 0:
+            continue
+        matches = (
+            np.all(np.abs(relative[neighbours] - relative[i]) <= tolerance, axis=1)
+            & np.all(np.abs(angles[neighbours] - angles[i]) <= ANGLE_TOLERANCE, axis=1)
+            # A scaled copy isn't a duplicate
+            & (np.abs(peaks[neighbours] - peaks[i]) <= tolerance * np.maximum(peaks[neighbours], peaks[i]))
+        )
+        for j in neighbours[matches]:
+            parent[root(j)] = root(i)
+
+    groups = {}
+    for i, name in enumerate(names):
+        groups.setdefault(root(i), []).append(name)
+    return list(groups.values())
+
+
+def duplicateGroups(profiles: dict, tolerance: float = NEAR_TOLERANCE) -> list:
+    """Groups a dictionary of file name to IESProfile by photometric payload.
+    Returns lists of file names that share a payload, only groups with more
+    than one profile are returned. Use tolerance=0 for exact duplicates only."""
+    groups = {}
+    for name in sorted(profiles, key=str.lower):
+        key = payloadHash(profiles[name]) if tolerance <= 0 else candidateKey(profiles[name])
+        groups.setdefault(key, []).append(name)
+    if tolerance > 0:
+        groups = {
+            i: group
+            for i, group in enumerate(
+                near
+                for candidates in groups.values()
+                if len(candidates) > 1
+                for near in nearGroups(candidates, profiles, tolerance)
+            )
+        }
+    return sorted(
+        (sorted(group, key=str.lower) for group in groups.values() if len(group) > 1),
+        key=lambda group: group[0].lower(),
+    )
+
+
+def duplicateLookup(profiles: dict, tolerance: float = NEAR_TOLERANCE) -> dict:
+    """Returns file name -> group of duplicates (including itself) for every
+    profile that has at least one duplicate."""
+    lookup = {}
+    for group in duplicateGroups(profiles, tolerance):
+        for name in group:
+            lookup[name] = group
+    return lookup
@@ -0,0 +1,53 @@
+"""Switches the IES profile of the thumbnail light for every rendered frame.
+
+Instead of a duplicated light per profile, the thumbnail scene keeps a single
+light per renderer and a frame list next to the scene file. A pre-render-frame
+callback reads the list and points the light at the frame's profile, so the
+scene stays the same size however many thumbnails are rendered.
+"""
+
+import json
+
+# Frame lists read by switchProfile, by path
+frameLists = {}
+
+
+def frameListPath(scenePath: str) -> str:
+    """Path of the frame list that belongs to a thumbnail scene."""
+    return scenePath.rsplit(".", 1)[0] + ".frames.json"
+
+
+def writeFrameList(path: str, lights: dict, profilePaths: list) -> None:
+    """Writes the profile of each frame, starting at frame 1. 'lights' is light
+    shape -> name of its IES file attribute."""
+    with open(path, "w") as frameFile:
+        json.dump({"lights": lights, "profiles": profilePaths}, frameFile)
+
+
+def preRenderCommand(libraryDirectory: str, path: str) -> str:
+    """MEL command that switches the profile before each frame is rendered."""
+    libraryDirectory = libraryDirectory.replace("\\", "/")
+    path = path.replace("\\", "/")
+    # Paths are quoted for Python, then the whole command for MEL, so quotes
+    # in folder names don't end either string
+    command = (
+        f"import sys; sys.path.insert(0, {libraryDirectory!r}); "
+        f"import iesFrameSwitch; iesFrameSwitch.switchProfile({path!r})"
+    )
+    return 'python("' + command.replace("\\", "\\\\").replace('"', '\\"') + '");'
+
+
+def switchProfile(path: str) -> None:
+    """Sets every light in the frame list to the current frame's profile."""
+    import maya.cmds as cmds
+
+    if path not in frameLists:
+        with open(path, "r") as frameFile:
+            frameLists[path] = json.load(frameFile)
+    frameList = frameLists[path]
+
+    frame = int(round(cmds.currentTime(query=True)))
+    profiles = frameList["profiles"]
+    profilePath = profiles[min(max(frame, 1), len(profiles)) - 1]
+    for lightShape, attribute in frameList["lights"].items():
+        cmds.setAttr(f"{lightShape}.{attribute}", profilePath, type="string")
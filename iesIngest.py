@@ -0,0 +1,276 @@
+"""Headless ingest of large IES libraries into the search catalog.
+
+Sources are read as a stream: folders are walked recursively and .zip
+vendor packs are read member by member without extracting them, so memory
+stays flat however many files there are. Profiles inside folders and
+archives are named by their path relative to the source, for example
+'vendor/pack.zip/downlights/a.ies'.
+
+ingestLibrary() spreads parsing, validation and metric computation across
+a process pool with a bounded number of tasks in flight, and writes the
+results to the catalog in batches as they arrive. Works from mayapy as well
+as a plain Python interpreter, but should not be run inside the Maya GUI's
+main thread.
+
+Usage:
+    python iesIngest.py <IES folder or .zip> [--catalog PATH] [--workers N] [--chunk N] [--batch N]
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import iesCatalog
+import iesMetrics
+import iesProfile
+
+
+def isArchive(path: str) -> bool:
+    return path.lower().endswith(".zip")
+
+
+def iterArchive(archivePath: str, prefix: str):
+    """Yields (name, archive path, member) for every .ies member of a zip file."""
+    try:
+        with zipfile.ZipFile(archivePath) as archive:
+            for member in archive.infolist():
+                if not member.is_dir() and member.filename.lower().endswith(".ies"):
+                    yield f"{prefix}/{member.filename}", archivePath, member.filename
+    except (OSError, zipfile.BadZipFile) as error:
+        print(f"{archivePath}: {error}")
+
+
+def iterSources(source: str):
+    """Yields (name, path, archive member or None) for every .ies file in a
+    folder tree or zip file, including the contents of zip files found in
+    the folders. Files are listed one folder at a time."""
+    if isArchive(source):
+        yield from iterArchive(source, os.path.basename(source))
+        return
+
+    for directory, folders, files in os.walk(source):
+        folders.sort()
+        relative = os.path.relpath(directory, source).replace("\\", "/")
+        prefix = "" if relative == "." else relative + "/"
+        for fileName in sorted(files):
+            path = os.path.join(directory, fileName)
+            if fileName.lower().endswith(".ies"):
+                yield prefix + fileName, path, None
+            elif isArchive(fileName):
+                yield from iterArchive(path, prefix + fileName)
+
+
+def readSources(sources):
+    """Yields (name, path, member, data) for each source, keeping at most
+    one archive open at a time."""
+    archivePath, archive = None, None
+    try:
+        for name, path, member in sources:
+            try:
+                if member is None:
+                    with open(path, "rb") as iesFile:
+                        data = iesFile.read()
+                else:
+                    if path != archivePath:
+                        if archive is not None:
+                            archive.close()
+                        archivePath, archive = path, zipfile.ZipFile(path)
+                    data = archive.read(member)
+            except (OSError, KeyError, zipfile.BadZipFile) as error:
+                yield name, path, member, error
+                continue
+            yield name, path, member, data
+    finally:
+        if archive is not None:
+            archive.close()
+
+
+def batched(iterable, size: int):
+    """Yields lists of up to 'size' items from an iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ingestChunk(files: list, source: str) -> tuple:
+    """Worker task. 'files' is a list of (name, path, archive member, known
+    content hash) and 'source' the sourceKey() of the ingested source.
+    Returns (catalog rows, unchanged names, errors as (name, message), lint
+    errors of profiles that were read as (name, message))."""
+    profiles = {}
+    unchanged = []
+    errors = []
+    knownHashes = {name: knownHash for name, _path, _member, knownHash in files}
+    sources = [(name, path, member) for name, path, member, _knownHash in files]
+    for name, path, member, data in readSources(sources):
+        if isinstance(data, Exception):
+            errors.append((name, str(data)))
+            continue
+        if knownHashes[name] and iesProfile.contentHash(data) == knownHashes[name]:
+            unchanged.append(name)
+            continue
+        try:
+            profiles[name] = iesProfile.parseIESBytes(data, name, path)
+        except iesProfile.IESParseError as error:
+            errors.append((name, str(error)))
+
+    # Metrics of the whole chunk are computed in one vectorized batch
+    metrics = iesMetrics.libraryMetrics(profiles) if profiles else {}
+    rows = [
+        iesCatalog.catalogRow(name, profile, metrics[name], source) for name, profile in profiles.items()
+    ]
+    invalid = [
+        (name, message)
+        for name, profile in profiles.items()
+        for severity, message in profile.issues
+        if severity == iesProfile.ISSUE_ERROR
+    ]
+    return rows, unchanged, errors, invalid
+
+
+def workerExecutable() -> str:
+    """Returns the interpreter used to start worker processes. Inside Maya the
+    running executable is maya.exe, workers have to use mayapy instead."""
+    executable = sys.executable
+    name = os.path.basename(executable).lower()
+    if name.startswith("maya") and not name.startswith("mayapy"):
+        extension = ".exe" if name.endswith(".exe") else ""
+        executable = os.path.join(os.path.dirname(executable), "mayapy" + extension)
+    return executable
+
+
+def printProgress(done: int, errors: int, elapsed: float) -> None:
+    """Default progress report, written to stdout for the command prompt."""
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"Ingested {done} files, {errors} errors ({rate:.0f} files/s)")
+    sys.stdout.flush()
+
+
+def startTracking(connection) -> None:
+    """Creates the temporary table of names seen during this ingest."""
+    connection.execute("CREATE TEMP TABLE IF NOT EXISTS seen (name TEXT PRIMARY KEY)")
+    connection.execute("DELETE FROM seen")
+
+
+def trackChunk(connection, names: list, source: str) -> dict:
+    """Records names as seen and returns their catalog hashes from 'source'."""
+    with connection:
+        connection.executemany("INSERT OR IGNORE INTO seen VALUES (?)", [(name,) for name in names])
+    placeholders = ",".join("?" * len(names))
+    return dict(
+        connection.execute(
+            f"SELECT name, hash FROM profiles WHERE source = ? AND name IN ({placeholders})",
+            [source] + names,
+        )
+    )
+
+
+def removeUnseen(connection, source: str) -> int:
+    """Drops the catalog rows of 'source' for files that weren't seen during
+    this ingest. Rows of other sources, such as the library itself, are kept."""
+    with connection:
+        cursor = connection.execute(
+            "DELETE FROM profiles WHERE source = ? AND name NOT IN (SELECT name FROM seen)", (source,)
+        )
+    return cursor.rowcount
+
+
+def ingestLibrary(
+    source: str,
+    catalogPath: str,
+    workers: int = None,
+    chunkSize: int = 64,
+    batchSize: int = 1000,
+    progress=printProgress,
+) -> dict:
+    """Parses every .ies file in a folder tree or zip file across a process
+    pool and updates the catalog at 'catalogPath'. Unchanged files (same
+    content hash as the catalog) are skipped and files that no longer exist
+    are dropped from the catalog, as are files that can no longer be read.
+    Only rows read from this source are removed. Returns counts of the 'added', 'unchanged',
+    'removed' and 'errors' files, and of the 'invalid' files that were read
+    but have lint errors."""
+
+    workers = workers or os.cpu_count() or 1
+    sourceKey = iesCatalog.sourceKey(source)
+    connection = iesCatalog.openCatalog(catalogPath)
+    startTracking(connection)
+
+    counts = {"added": 0, "unchanged": 0, "removed": 0, "errors": 0, "invalid": 0}
+    pendingRows = []
+    done = 0
+    start = time.perf_counter()
+
+    def collect(future) -> None:
+        nonlocal pendingRows, done
+        rows, unchanged, errors, invalid = future.result()
+        pendingRows.extend(rows)
+        counts["added"] += len(rows)
+        counts["unchanged"] += len(unchanged)
+        counts["errors"] += len(errors)
+        counts["invalid"] += len({name for name, _message in invalid})
+        for name, message in errors + invalid:
+            print(f"{name}: {message}")
+        # Files that used to be read but now fail mustn't keep their old row
+        iesCatalog.removeRows(connection, [name for name, _message in errors], sourceKey)
+
+        # Stream finished rows into the catalog in batches
+        if len(pendingRows) >= batchSize:
+            iesCatalog.writeRows(connection, pendingRows)
+            pendingRows = []
+
+        done += len(rows) + len(unchanged) + len(errors)
+        if progress:
+            progress(done, counts["errors"], time.perf_counter() - start)
+
+    multiprocessing.set_executable(workerExecutable())
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Only a few chunks are queued ahead of the workers so the listing,
+        # the pending tasks and their results all stay bounded in memory
+        inFlight = set()
+        for chunk in batched(iterSources(source), chunkSize):
+            knownHashes = trackChunk(connection, [name for name, _path, _member in chunk], sourceKey)
+            files = [(name, path, member, knownHashes.get(name)) for name, path, member in chunk]
+            inFlight.add(executor.submit(ingestChunk, files, sourceKey))
+            if len(inFlight) >= workers * 2:
+                finished, inFlight = wait(inFlight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    collect(future)
+        for future in inFlight:
+            collect(future)
+
+    iesCatalog.writeRows(connection, pendingRows)
+    counts["removed"] = removeUnseen(connection, sourceKey)
+    connection.close()
+    return counts
+
+
+def main(arguments=None) -> None:
+    parser = argparse.ArgumentParser(description="Ingest IES files into the library catalog.")
+    parser.add_argument("source", help="folder or .zip file containing .ies files")
+    parser.add_argument("--catalog", help="catalog path, defaults to IES_cache next to the source")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the core count")
+    parser.add_argument("--chunk", type=int, default=64, help="files per worker task")
+    parser.add_argument("--batch", type=int, default=1000, help="catalog rows per write")
+    options = parser.parse_args(arguments)
+
+    catalogPath = options.catalog or os.path.join(
+        os.path.dirname(os.path.normpath(options.source)), "IES_cache", iesCatalog.CATALOG_NAME
+    )
+    counts = ingestLibrary(options.source, catalogPath, options.workers, options.chunk, options.batch)
+    print(
+        f"Done: {counts['added']} added or changed, {counts['unchanged']} unchanged, "
+        f"{counts['removed']} removed, {counts['errors']} errors, {counts['invalid']} invalid"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Interpolates IES candela values in arbitrary directions.
+
+Directions are given as an (N, 2) array of (vertical, horizontal) angles in
+degrees. Horizontal angles are folded onto the measured planes following
+the profile's symmetry class (rotational, quadrant, bilateral or full), so
+the full grid never has to be expanded, and candela values are interpolated
+on the measured grid, bilinear or bicubic (Catmull-Rom), using array
+operations only.
+"""
+
+import numpy as np
+
+from iesProfile import SYMMETRY_NONE, foldHorizontal
+
+
+def gridPositions(grid: np.ndarray, values: np.ndarray) -> tuple:
+    """Returns the cell index and fractional position of 'values' on 'grid'.
+    Values outside the grid are clamped to its ends."""
+    if len(grid) == 1:
+        return np.zeros(len(values), np.intp), np.zeros(len(values))
+    values = np.clip(values, grid[0], grid[-1])
+    index = np.clip(np.searchsorted(grid, values, side="right") - 1, 0, len(grid) - 2)
+    span = grid[index + 1] - grid[index]
+    fraction = np.where(span > 0, (values - grid[index]) / np.where(span > 0, span, 1.0), 0.0)
+    return index, fraction
+
+
+def cubicWeights(t: np.ndarray) -> tuple:
+    """Catmull-Rom weights of the four neighbouring samples."""
+    t2 = t * t
+    t3 = t2 * t
+    return (
+        (-t3 + 2 * t2 - t) / 2,
+        (3 * t3 - 5 * t2 + 2) / 2,
+        (-3 * t3 + 4 * t2 + t) / 2,
+        (t3 - t2) / 2,
+    )
+
+
+def interpolateCandela(profile, angles, method: str = "bilinear") -> np.ndarray:
+    """Returns the candela of 'profile' for each (vertical, horizontal) row of
+    'angles'. Directions outside the measured vertical range return 0.
+    'method' is "bilinear" or "bicubic"."""
+
+    angles = np.asarray(angles, dtype=np.float64).reshape(-1, 2)
+    vertical = np.asarray(profile.verticalAngles, dtype=np.float64)
+    horizontal = np.asarray(profile.horizontalAngles, dtype=np.float64)
+    candela = np.asarray(profile.candela, dtype=np.float64)
+
+    # Full 0-360 files may leave out the closing 360 plane, add it so
+    # directions between the last plane and 360 wrap around to 0
+    symmetry = profile.symmetry
+    if symmetry == SYMMETRY_NONE and horizontal[0] == 0 and horizontal[-1] < 360:
+        horizontal = np.append(horizontal, 360.0)
+        candela = np.vstack((candela, candela[:1]))
+
+    queryVertical = angles[:, 0]
+    queryHorizontal = foldHorizontal(angles[:, 1], symmetry)
+
+    vIndex, vFraction = gridPositions(vertical, queryVertical)
+    hIndex, hFraction = gridPositions(horizontal, queryHorizontal)
+
+    if method == "bicubic":
+        result = np.zeros(len(angles))
+        vWeights = cubicWeights(vFraction)
+        hWeights = cubicWeights(hFraction)
+        lastV, lastH = len(vertical) - 1, len(horizontal) - 1
+        for i, hWeight in enumerate(hWeights):
+            rows = np.clip(hIndex + i - 1, 0, lastH)
+            for j, vWeight in enumerate(vWeights):
+                columns = np.clip(vIndex + j - 1, 0, lastV)
+                result += hWeight * vWeight * candela[rows, columns]
+        # Cubic overshoot can dip below zero next to dark regions
+        result = np.maximum(result, 0.0)
+    elif method == "bilinear":
+        nextV = np.minimum(vIndex + 1, len(vertical) - 1)
+        nextH = np.minimum(hIndex + 1, len(horizontal) - 1)
+        lower = candela[hIndex, vIndex] * (1 - vFraction) + candela[hIndex, nextV] * vFraction
+        upper = candela[nextH, vIndex] * (1 - vFraction) + candela[nextH, nextV] * vFraction
+        result = lower * (1 - hFraction) + upper * hFraction
+    else:
+        raise ValueError(f"{method} is not a valid interpolation method")
+
+    outside = (queryVertical < vertical[0]) | (queryVertical > vertical[-1])
+    result[outside] = 0.0
+    return result
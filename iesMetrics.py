@@ -0,0 +1,215 @@
+"""Photometric metrics computed from parsed IES profiles.
+
+Metrics are computed for a whole library at once. Every profile's candela
+grid is averaged over its horizontal planes and resampled onto a shared
+vertical angle grid, so each metric is a single NumPy operation over an
+(profiles, angles) array rather than a loop over profiles.
+"""
+
+import numpy as np
+
+import iesProfile
+
+# Fractions of peak intensity that define the beam and field edges
+BEAM_FRACTION = 0.5
+FIELD_FRACTION = 0.1
+
+# Shared vertical angle grid (degrees) the intensity curves are resampled to
+gridStep = 0.5
+gridAngles = np.arange(0.0, 180.0 + gridStep, gridStep)
+
+# Zones reported as zonal lumens, (name, start angle, end angle)
+lumenZones = (
+    ("lumens0to30", 0.0, 30.0),
+    ("lumens0to40", 0.0, 40.0),
+    ("lumens0to60", 0.0, 60.0),
+    ("lumens0to90", 0.0, 90.0),
+    ("lumens90to180", 90.0, 180.0),
+)
+
+metricNames = (
+    "lumens",
+    *(zone[0] for zone in lumenZones),
+    "beamAngle",
+    "fieldAngle",
+    "peakCandela",
+    "efficacy",
+    "spacingCriterion",
+)
+
+
+def bandEdges() -> np.ndarray:
+    """Angles (degrees) where the band around each grid angle starts and ends."""
+    return np.concatenate(([0.0], (gridAngles[:-1] + gridAngles[1:]) / 2, [180.0]))
+
+
+def bandSolidAngles(start: float = 0.0, end: float = 180.0) -> np.ndarray:
+    """Solid angle (steradians) of the part of each grid angle's band that
+    lies between 'start' and 'end', so a band straddling a zone boundary is
+    split between the two zones."""
+    edges = bandEdges()
+    low = np.radians(np.clip(edges[:-1], start, end))
+    high = np.radians(np.clip(edges[1:], start, end))
+    return 2 * np.pi * (np.cos(low) - np.cos(high))
+
+
+solidAngles = bandSolidAngles()
+zoneWeights = np.stack([bandSolidAngles(start, end) for _name, start, end in lumenZones], axis=1)
+
+
+def horizontalWeights(horizontal: np.ndarray, symmetry: str = None) -> np.ndarray:
+    """Trapezoid weights that average a profile over its horizontal planes.
+    Profiles measured all the way around also get the segment that closes
+    the circle, from the last plane back to the first one at 360."""
+    if len(horizontal) == 1 or horizontal[-1] == horizontal[0]:
+        return np.full(len(horizontal), 1.0 / len(horizontal))
+    spacing = np.diff(horizontal.astype(np.float64))
+    weights = np.zeros(len(horizontal))
+    weights[:-1] += spacing / 2
+    weights[1:] += spacing / 2
+    if symmetry == iesProfile.SYMMETRY_NONE:
+        closing = 360.0 - float(horizontal[-1] - horizontal[0])
+        if closing > 0:
+            weights[0] += closing / 2
+            weights[-1] += closing / 2
+    return weights / weights.sum()
+
+
+def intensityCurves(profiles: list) -> np.ndarray:
+    """Returns an (profiles, gridAngles) array of each profile's intensity
+    averaged over its horizontal planes. Directions outside a profile's
+    measured vertical range have zero intensity."""
+
+    count = len(profiles)
+    verticalCounts = np.array([len(p.verticalAngles) for p in profiles])
+    verticalOffsets = np.concatenate(([0], np.cumsum(verticalCounts)[:-1]))
+
+    # Average over horizontal planes with one weighted bincount over every
+    # candela value of the library
+    candela = np.concatenate([np.asarray(p.candela, np.float64).ravel() for p in profiles])
+    weights = np.concatenate(
+        [
+            np.repeat(
+                horizontalWeights(np.asarray(p.horizontalAngles), p.symmetry), len(p.verticalAngles)
+            )
+            for p in profiles
+        ]
+    )
+    columns = np.concatenate(
+        [np.tile(np.arange(len(p.verticalAngles)), len(p.horizontalAngles)) for p in profiles]
+    )
+    owners = np.repeat(np.arange(count), [p.candela.size for p in profiles])
+    meanIntensity = np.bincount(
+        verticalOffsets[owners] + columns,
+        weights=candela * weights,
+        minlength=verticalCounts.sum(),
+    )
+
+    # Resample every curve in one np.interp call by shifting each profile's
+    # angles into its own range of the number line
+    vertical = np.concatenate([np.asarray(p.verticalAngles, np.float64) for p in profiles])
+    shift = 1000.0
+    angleOwners = np.repeat(np.arange(count), verticalCounts)
+    lowest = vertical[verticalOffsets]
+    highest = vertical[verticalOffsets + verticalCounts - 1]
+    queries = np.clip(gridAngles[None, :], lowest[:, None], highest[:, None])
+    curves = np.interp(
+        queries + shift * np.arange(count)[:, None],
+        vertical + shift * angleOwners,
+        meanIntensity,
+    )
+    outside = (gridAngles[None, :] < lowest[:, None]) | (gridAngles[None, :] > highest[:, None])
+    curves[outside] = 0.0
+    return curves
+
+
+def spreadAngles(curves: np.ndarray, fraction: float, limits: np.ndarray = None) -> np.ndarray:
+    """Full cone angles where each curve falls below 'fraction' of its peak,
+    searching outward from the peak. 'limits' is the widest half angle of
+    each curve, the end of its measured vertical range."""
+    peaks = curves.max(axis=1)
+    thresholds = peaks * fraction
+    peakIndex = curves.argmax(axis=1)
+    indices = np.arange(curves.shape[1])
+
+    below = (curves < thresholds[:, None]) & (indices[None, :] > peakIndex[:, None])
+    found = below.any(axis=1)
+    first = np.where(found, below.argmax(axis=1), curves.shape[1] - 1)
+    previous = np.maximum(first - 1, 0)
+
+    rows = np.arange(len(curves))
+    i0, i1 = curves[rows, previous], curves[rows, first]
+    step = np.where(i0 > i1, (i0 - thresholds) / np.where(i0 > i1, i0 - i1, 1.0), 0.0)
+    angles = gridAngles[previous] + np.clip(step, 0.0, 1.0) * gridStep
+    angles = np.where(found, angles, gridAngles[-1])
+    if limits is not None:
+        # The drop to zero past the measured range mustn't widen the cone
+        angles = np.minimum(angles, limits)
+    return np.where(peaks > 0, 2 * angles, 0.0)
+
+
+def spacingCriteria(curves: np.ndarray) -> np.ndarray:
+    """Approximate spacing to mounting height ratio. Two fixtures spaced S
+    apart at height h light the midpoint between them as brightly as the
+    point under each fixture while 2 * I(a) * cos(a)^3 >= I(0), with
+    tan(a) = S / 2h."""
+    downward = gridAngles < 90
+    angles = np.radians(gridAngles[downward])
+    nadir = curves[:, 0]
+    midpoint = 2 * curves[:, downward] * np.cos(angles)[None, :] ** 3
+
+    below = (midpoint < nadir[:, None]) & (np.arange(len(angles))[None, :] > 0)
+    found = below.any(axis=1)
+    first = below.argmax(axis=1)
+    edge = np.where(found, angles[np.maximum(first - 1, 0)], angles[-1])
+    return np.where(nadir > 0, 2 * np.tan(edge), 0.0)
+
+
+def computeMetrics(profiles: list) -> np.ndarray:
+    """Computes every metric for a list of profiles. Returns a structured
+    array with one record per profile and a field per name in metricNames."""
+
+    metrics = np.zeros(len(profiles), dtype=[(name, np.float64) for name in metricNames])
+    if not profiles:
+        return metrics
+
+    curves = intensityCurves(profiles)
+
+    # Profiles only measured above the horizon are treated as uplights and
+    # their spread is measured from zenith instead of nadir
+    uplight = np.array([float(p.verticalAngles[0]) >= 90 for p in profiles])
+    spreadCurves = np.where(uplight[:, None], curves[:, ::-1], curves)
+    lowest = np.array([float(p.verticalAngles[0]) for p in profiles])
+    highest = np.array([float(p.verticalAngles[-1]) for p in profiles])
+    spreadLimits = np.where(uplight, 180.0 - lowest, highest)
+
+    zonal = curves @ zoneWeights
+    for i, (name, _start, _end) in enumerate(lumenZones):
+        metrics[name] = zonal[:, i]
+    metrics["lumens"] = curves @ solidAngles
+    metrics["beamAngle"] = spreadAngles(spreadCurves, BEAM_FRACTION, spreadLimits)
+    metrics["fieldAngle"] = spreadAngles(spreadCurves, FIELD_FRACTION, spreadLimits)
+    metrics["peakCandela"] = [float(np.max(p.candela)) for p in profiles]
+    watts = np.array([p.inputWatts for p in profiles], dtype=np.float64)
+    metrics["efficacy"] = np.divide(
+        metrics["lumens"], watts, out=np.zeros(len(profiles)), where=watts > 0
+    )
+    metrics["spacingCriterion"] = spacingCriteria(spreadCurves)
+
+    # The angles of Type A and B profiles don't describe the same directions
+    # as Type C ones, their metrics are left empty rather than wrong
+    typeC = np.array([p.photometricType == iesProfile.PHOTOMETRIC_TYPE_C for p in profiles])
+    for name in metricNames:
+        if name != "peakCandela":
+            metrics[name][~typeC] = np.nan
+    return metrics
+
+
+def libraryMetrics(profiles: dict) -> dict:
+    """Computes metrics for a dictionary of file name to IESProfile. Returns
+    file name to a dictionary of metric name to value."""
+    names = list(profiles)
+    metrics = computeMetrics([profiles[name] for name in names])
+    return {
+        name: dict(zip(metricNames, record.tolist())) for name, record in zip(names, metrics)
+    }
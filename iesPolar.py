@@ -0,0 +1,131 @@
+"""Polar candela diagrams of IES profiles.
+
+Draws the classic photometric polar plot, nadir at the bottom, with each
+plane pair on one curve: the C0 plane to the right and C180 to the left,
+C90 and C270 likewise. Curves of a whole batch of profiles are sampled and
+rasterized in one set of array operations, no renderer or plotting
+library is involved. Plots are stored in the cache folder by content hash,
+so they are drawn once per file contents.
+"""
+
+import os
+
+import numpy as np
+
+import iesInterpolation
+import pngImage
+
+POLAR_FOLDER = "polar"
+
+# Horizontal planes drawn by default, each together with its opposite plane
+defaultPlanes = (0.0, 90.0)
+
+# Colours of the plane curves in order, then background and grid
+planeColours = np.array(
+    [(230, 90, 70), (80, 150, 240), (110, 200, 110), (230, 190, 60)], dtype=np.uint8
+)
+backgroundColour = np.array((43, 43, 43), dtype=np.uint8)
+gridColour = np.array((80, 80, 80), dtype=np.uint8)
+
+# Vertical angle step of the sampled curves and segments drawn between samples
+sampleStep = 0.5
+subdivisions = 4
+
+
+def plotBackground(size: int) -> np.ndarray:
+    """Returns the (size, size, 3) background with intensity rings at 25%
+    steps and angle spokes every 30 degrees."""
+    image = np.empty((size, size, 3), dtype=np.uint8)
+    image[:] = backgroundColour
+
+    centre = (size - 1) / 2
+    radius = size * 0.45
+    y, x = np.mgrid[:size, :size] - centre
+    distance = np.hypot(x, y)
+    angle = np.degrees(np.arctan2(x, y)) % 30.0
+
+    rings = np.zeros((size, size), dtype=bool)
+    for fraction in (0.25, 0.5, 0.75, 1.0):
+        rings |= np.abs(distance - radius * fraction) < 0.5
+    spokeWidth = np.degrees(0.5 / np.maximum(distance, 1.0))
+    spokes = (np.minimum(angle, 30.0 - angle) < spokeWidth) & (distance <= radius)
+    image[rings | spokes] = gridColour
+    return image
+
+
+def planeCurves(profiles: list, planes=defaultPlanes) -> np.ndarray:
+    """Samples each plane pair of every profile from 0 to 180 degrees.
+    Returns an array of (profiles, planes, 2 sides, samples) candela
+    values, side 0 is the plane and side 1 its opposite plane."""
+    vertical = np.arange(0.0, 180.0 + sampleStep, sampleStep)
+    horizontal = np.repeat([(plane, plane + 180.0) for plane in planes], len(vertical))
+    directions = np.stack((np.tile(vertical, 2 * len(planes)), horizontal), axis=1)
+    curves = np.stack(
+        [iesInterpolation.interpolateCandela(profile, directions) for profile in profiles]
+    )
+    return curves.reshape(len(profiles), len(planes), 2, len(vertical))
+
+
+def rasterizePlots(profiles: list, size: int = 256, planes=defaultPlanes) -> np.ndarray:
+    """Draws the polar plots of a batch of profiles. Returns a
+    (profiles, size, size, 3) uint8 array. Curves are scaled to each
+    profile's peak over the drawn planes."""
+    count = len(profiles)
+    images = np.broadcast_to(plotBackground(size), (count, size, size, 3)).copy()
+    if not count:
+        return images
+
+    curves = planeCurves(profiles, planes)
+    peaks = curves.reshape(count, -1).max(axis=1)
+    curves = curves / np.where(peaks > 0, peaks, 1.0)[:, None, None, None]
+
+    # Subdivide between samples so steep beam edges draw without gaps
+    samples = curves.shape[-1]
+    positions = np.linspace(0, samples - 1, (samples - 1) * subdivisions + 1)
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, samples - 1)
+    fraction = positions - lower
+    radii = curves[..., lower] * (1 - fraction) + curves[..., upper] * fraction
+    theta = np.radians(positions * sampleStep)
+
+    # Nadir points down, the plane is drawn to the right and its opposite to the left
+    centre = (size - 1) / 2
+    scale = size * 0.45
+    side = np.array([1.0, -1.0])[None, None, :, None]
+    x = np.rint(centre + side * radii * scale * np.sin(theta)).astype(np.intp)
+    y = np.rint(centre + radii * scale * np.cos(theta)).astype(np.intp)
+
+    # Two pixel wide lines, later planes are drawn over earlier ones
+    profileIndex = np.broadcast_to(np.arange(count)[:, None, None, None], x.shape)
+    planeIndex = np.broadcast_to(np.arange(len(planes))[None, :, None, None], x.shape)
+    colours = planeColours[planeIndex % len(planeColours)]
+    for offsetX, offsetY in ((0, 0), (1, 0), (0, 1)):
+        images[
+            profileIndex,
+            np.clip(y + offsetY, 0, size - 1),
+            np.clip(x + offsetX, 0, size - 1),
+        ] = colours
+    return images
+
+
+def polarPlotPath(cacheDirectory: str, profile) -> str:
+    return os.path.join(cacheDirectory, POLAR_FOLDER, profile.contentHash + ".png")
+
+
+def writePolarPlots(profiles: dict, cacheDirectory: str, size: int = 256, batchSize: int = 64) -> dict:
+    """Draws the plots of a dictionary of file name to IESProfile that aren't
+    cached yet, in batches. Returns file name -> plot path for every profile."""
+    os.makedirs(os.path.join(cacheDirectory, POLAR_FOLDER), exist_ok=True)
+    paths = {name: polarPlotPath(cacheDirectory, profile) for name, profile in profiles.items()}
+
+    missing = {}
+    for name, path in paths.items():
+        if not os.path.isfile(path):
+            missing.setdefault(path, profiles[name])
+    missingPaths = list(missing)
+    for start in range(0, len(missingPaths), batchSize):
+        batchPaths = missingPaths[start : start + batchSize]
+        images = rasterizePlots([missing[path] for path in batchPaths], size)
+        for path, image in zip(batchPaths, images):
+            pngImage.writePNG(path, image)
+    return paths
@@ -0,0 +1,459 @@
+"""Reads IES (IESNA LM-63) photometric files without Maya.
+
+Supports the unlabelled 1986 layout as well as IESNA91, LM-63-1995,
+LM-63-2002 and LM-63-2019 files. Each file is parsed into an IESProfile
+holding the header keywords, TILT data and the candela grid as a
+contiguous NumPy array.
+
+Profiles only keep the horizontal planes that were measured, along with
+their symmetry class. The full 0-360 grid is expanded on request and
+cached on the profile.
+
+Files are linted in the same pass: problems that stop a file from being
+read raise IESParseError, anything else that would break or distort a
+render is recorded in the profile's 'issues'.
+"""
+
+import hashlib
+import os
+import re
+
+import numpy as np
+
+# Photometric types from the LM-63 standard
+PHOTOMETRIC_TYPE_C = 1
+PHOTOMETRIC_TYPE_B = 2
+PHOTOMETRIC_TYPE_A = 3
+
+# Units used for the luminous opening dimensions
+UNITS_FEET = 1
+UNITS_METERS = 2
+
+# Type C horizontal symmetry classes
+SYMMETRY_ROTATIONAL = "rotational"  # single horizontal angle
+SYMMETRY_QUADRANT = "quadrant"  # 0 to 90
+SYMMETRY_BILATERAL = "bilateral"  # 0 to 180
+SYMMETRY_BILATERAL_90 = "bilateral90"  # 90 to 270
+SYMMETRY_NONE = "none"  # full 0 to 360
+
+# Planes used when expanding rotationally symmetric profiles
+rotationalPlanes = np.array([0.0, 90.0, 180.0, 270.0, 360.0], dtype=np.float32)
+
+# Severity of lint issues, profiles with errors are left out of thumbnail renders
+ISSUE_ERROR = "error"
+ISSUE_WARNING = "warning"
+
+keywordPattern = re.compile(r"^\[(\w+)\]\s*(.*)$")
+
+
+class IESParseError(ValueError):
+    """Raised when an IES file cannot be read as a photometric profile."""
+
+
+class IESProfile:
+    """Photometric data of a single IES file.
+
+    Candela values are already scaled by the file's candela multiplier and
+    are stored as a float32 array of shape (horizontal, vertical), for the
+    measured horizontal planes only. 'metrics' holds the values from
+    iesMetrics once they have been computed. 'issues' is a list of
+    (severity, message) pairs found by lintProfile.
+    """
+
+    __slots__ = (
+        "name",
+        "path",
+        "contentHash",
+        "format",
+        "keywords",
+        "tilt",
+        "tiltAngles",
+        "tiltFactors",
+        "lamps",
+        "lumensPerLamp",
+        "multiplier",
+        "photometricType",
+        "units",
+        "width",
+        "length",
+        "height",
+        "ballastFactor",
+        "inputWatts",
+        "verticalAngles",
+        "horizontalAngles",
+        "candela",
+        "symmetry",
+        "metrics",
+        "expanded",
+        "issues",
+    )
+
+    def __init__(self, name="", path=""):
+        self.name = name
+        self.path = path
+        self.contentHash = ""
+        self.format = ""
+        self.keywords = {}
+        self.tilt = "NONE"
+        self.tiltAngles = None
+        self.tiltFactors = None
+        self.lamps = 1
+        self.lumensPerLamp = -1.0
+        self.multiplier = 1.0
+        self.photometricType = PHOTOMETRIC_TYPE_C
+        self.units = UNITS_FEET
+        self.width = 0.0
+        self.length = 0.0
+        self.height = 0.0
+        self.ballastFactor = 1.0
+        self.inputWatts = 0.0
+        self.verticalAngles = None
+        self.horizontalAngles = None
+        self.candela = None
+        self.symmetry = SYMMETRY_NONE
+        self.metrics = None
+        self.expanded = None
+        self.issues = []
+
+    def __repr__(self) -> str:
+        shape = None if self.candela is None else self.candela.shape
+        return f"<IESProfile {self.name!r} {self.format} candela={shape}>"
+
+    @property
+    def lumens(self) -> float:
+        """Rated lamp lumens, negative for absolute photometry files."""
+        if self.lumensPerLamp < 0:
+            return -1.0
+        return self.lamps * self.lumensPerLamp
+
+    @property
+    def peakCandela(self) -> float:
+        """Highest candela value in the grid."""
+        return float(self.candela.max())
+
+    @property
+    def isValid(self) -> bool:
+        """False if linting found errors that would break a render."""
+        return not any(severity == ISSUE_ERROR for severity, _message in self.issues)
+
+    def keyword(self, key, default="") -> str:
+        """Returns the value of a header keyword such as MANUFAC or LAMP."""
+        return self.keywords.get(key.upper(), default)
+
+    def expandedGrid(self) -> tuple:
+        """Returns (horizontal angles, candela) covering the full 0-360 range.
+        Rotationally symmetric profiles return a read-only broadcast view of
+        their single plane, other symmetry classes are mirrored once and the
+        result is kept until releaseExpanded() is called."""
+        if self.expanded is None:
+            self.expanded = expandGrid(
+                self.horizontalAngles, self.candela, self.symmetry
+            )
+        return self.expanded
+
+    def releaseExpanded(self) -> None:
+        """Frees the cached full grid."""
+        self.expanded = None
+
+
+def horizontalSymmetry(horizontalAngles) -> str:
+    """Returns the Type C symmetry class implied by the horizontal angles."""
+    first, last = float(horizontalAngles[0]), float(horizontalAngles[-1])
+    if len(horizontalAngles) == 1 or first == last:
+        return SYMMETRY_ROTATIONAL
+    if first == 0 and last == 90:
+        return SYMMETRY_QUADRANT
+    if first == 0 and last == 180:
+        return SYMMETRY_BILATERAL
+    if first == 90 and last == 270:
+        return SYMMETRY_BILATERAL_90
+    return SYMMETRY_NONE
+
+
+def foldHorizontal(horizontal: np.ndarray, symmetry: str) -> np.ndarray:
+    """Maps horizontal angles onto the measured range of a symmetry class."""
+    horizontal = np.mod(horizontal, 360.0)
+    if symmetry == SYMMETRY_ROTATIONAL:
+        return np.zeros_like(horizontal)
+    if symmetry == SYMMETRY_QUADRANT:
+        horizontal = np.where(horizontal > 180, 360 - horizontal, horizontal)
+        return np.where(horizontal > 90, 180 - horizontal, horizontal)
+    if symmetry == SYMMETRY_BILATERAL:
+        return np.where(horizontal > 180, 360 - horizontal, horizontal)
+    if symmetry == SYMMETRY_BILATERAL_90:
+        outside = (horizontal < 90) | (horizontal > 270)
+        return np.where(outside, np.mod(180 - horizontal, 360.0), horizontal)
+    return horizontal
+
+
+def expandGrid(horizontalAngles, candela, symmetry: str) -> tuple:
+    """Expands measured horizontal planes to the full 0-360 range of a symmetry class."""
+    if symmetry == SYMMETRY_ROTATIONAL:
+        return rotationalPlanes, np.broadcast_to(
+            candela[:1], (len(rotationalPlanes), candela.shape[1])
+        )
+
+    measured = np.asarray(horizontalAngles, dtype=np.float64)
+    if symmetry == SYMMETRY_NONE:
+        # Close the circle with a copy of the 0 plane when it's left out
+        if measured[0] == 0 and measured[-1] < 360:
+            return (
+                np.append(horizontalAngles, np.float32(360)),
+                np.vstack((candela, candela[:1])),
+            )
+        return horizontalAngles, candela
+
+    # Mirror the measured planes across the symmetry class's own axes
+    if symmetry == SYMMETRY_QUADRANT:
+        mirrored = np.concatenate((measured, 180 - measured, 180 + measured, 360 - measured))
+    elif symmetry == SYMMETRY_BILATERAL:
+        mirrored = np.concatenate((measured, 360 - measured))
+    else:
+        mirrored = np.concatenate((measured, 180 - measured))
+    full = np.unique(np.mod(mirrored, 360.0))
+    full = np.append(full, 360.0) if full[0] == 0 else full
+
+    # Every full angle folds back onto a measured plane, take the nearest one
+    # so rounding in the fold can't pick its neighbour
+    folded = foldHorizontal(full, symmetry)
+    upper = np.clip(np.searchsorted(measured, folded), 1, max(len(measured) - 1, 1))
+    lower = upper - 1
+    source = np.where(np.abs(folded - measured[lower]) <= np.abs(measured[upper] - folded), lower, upper)
+    return full.astype(np.float32), np.ascontiguousarray(candela[source])
+
+
+def contentHash(data: bytes) -> str:
+    """Returns the hash used to identify the raw contents of an IES file."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def headerInteger(value: float, field: str, name: str) -> int:
+    """Returns a count or code from the numeric header, raising IESParseError
+    unless it's a finite, non-negative whole number."""
+    if not np.isfinite(value) or value < 0 or value != int(value):
+        raise IESParseError(f"{name}: invalid {field} {value:g}")
+    return int(value)
+
+
+def parseIES(text: str, name="", path="") -> IESProfile:
+    """Parses the contents of an IES file and returns an IESProfile."""
+
+    lines = text.splitlines()
+    profile = IESProfile(name, path)
+
+    # Find the TILT line which separates the header from the numeric data
+    tiltIndex = None
+    for i, line in enumerate(lines):
+        if line.lstrip().upper().startswith("TILT"):
+            tiltIndex = i
+            break
+    if tiltIndex is None:
+        raise IESParseError(f"{name or path}: missing TILT line")
+
+    header = lines[:tiltIndex]
+    firstLine = header[0].strip().upper() if header else ""
+    if firstLine.startswith("IESNA") or firstLine.startswith("IES:"):
+        profile.format = header[0].strip()
+        header = header[1:]
+    else:
+        profile.format = "LM-63-1986"
+
+    # Header keywords, unlabelled lines (1986 layout) are kept under OTHER
+    keywords = profile.keywords
+    lastKey = "OTHER"
+    for line in header:
+        line = line.strip()
+        if not line:
+            continue
+        match = keywordPattern.match(line)
+        if match:
+            key, value = match.group(1).upper(), match.group(2).strip()
+            if key == "MORE":
+                key = lastKey
+            lastKey = key
+        else:
+            key, value = "OTHER", line
+        if key in keywords:
+            keywords[key] += "\n" + value
+        else:
+            keywords[key] = value
+
+    profile.tilt = lines[tiltIndex].split("=", 1)[-1].strip() or "NONE"
+
+    tokens = " ".join(lines[tiltIndex + 1 :]).replace(",", " ").split()
+    try:
+        values = np.array(tokens, dtype=np.float64)
+    except ValueError:
+        # Older files end with trailing text such as END, keep the numbers
+        # before it and let the count checks below catch real problems
+        numericTokens = []
+        for token in tokens:
+            try:
+                float(token)
+            except ValueError:
+                break
+            numericTokens.append(token)
+        values = np.array(numericTokens, dtype=np.float64)
+        trailing = tokens[len(numericTokens)]
+        if trailing.upper() != "END" and not trailing.startswith("\x1a"):
+            profile.issues.append((ISSUE_WARNING, f"unexpected text '{trailing[:20]}' in photometric data"))
+
+    position = 0
+    if profile.tilt.upper() == "INCLUDE":
+        if len(values) < 2:
+            raise IESParseError(f"{name or path}: truncated TILT block")
+        pairs = headerInteger(values[1], "TILT angle count", name or path)
+        position = 2 + 2 * pairs
+        if len(values) < position:
+            raise IESParseError(f"{name or path}: truncated TILT block")
+        profile.tiltAngles = values[2 : 2 + pairs].astype(np.float32)
+        profile.tiltFactors = values[2 + pairs : position].astype(np.float32)
+
+    if len(values) < position + 13:
+        raise IESParseError(f"{name or path}: truncated photometric header")
+    (
+        lamps,
+        profile.lumensPerLamp,
+        profile.multiplier,
+        verticalCount,
+        horizontalCount,
+        photometricType,
+        units,
+        profile.width,
+        profile.length,
+        profile.height,
+        profile.ballastFactor,
+        _futureUse,
+        profile.inputWatts,
+    ) = values[position : position + 13].tolist()
+    if not np.all(np.isfinite(values[position : position + 13])):
+        raise IESParseError(f"{name or path}: photometric header has values that aren't numbers")
+    position += 13
+
+    profile.lamps = headerInteger(lamps, "lamp count", name or path)
+    profile.photometricType = headerInteger(photometricType, "photometric type", name or path)
+    profile.units = headerInteger(units, "units type", name or path)
+    verticalCount = headerInteger(verticalCount, "vertical angle count", name or path)
+    horizontalCount = headerInteger(horizontalCount, "horizontal angle count", name or path)
+    if profile.multiplier < 0:
+        raise IESParseError(f"{name or path}: negative candela multiplier {profile.multiplier:g}")
+    if verticalCount < 1 or horizontalCount < 1:
+        raise IESParseError(f"{name or path}: invalid angle counts")
+
+    end = position + verticalCount + horizontalCount * (verticalCount + 1)
+    if len(values) < end:
+        raise IESParseError(f"{name or path}: truncated candela data")
+
+    profile.verticalAngles = values[position : position + verticalCount].astype(
+        np.float32
+    )
+    position += verticalCount
+    profile.horizontalAngles = values[
+        position : position + horizontalCount
+    ].astype(np.float32)
+    position += horizontalCount
+
+    candela = values[position:end].reshape(horizontalCount, verticalCount)
+    profile.candela = np.ascontiguousarray(
+        candela * profile.multiplier, dtype=np.float32
+    )
+    if profile.photometricType == PHOTOMETRIC_TYPE_C:
+        profile.symmetry = horizontalSymmetry(profile.horizontalAngles)
+
+    if len(values) > end:
+        profile.issues.append(
+            (
+                ISSUE_ERROR,
+                f"angle counts don't match the header, {len(values) - end} values left over "
+                f"after {verticalCount} x {horizontalCount} candela values",
+            )
+        )
+    lintProfile(profile)
+    return profile
+
+
+def lintProfile(profile: IESProfile) -> list:
+    """Checks the parsed data of a profile for problems that break or distort
+    renders and adds them to profile.issues. Returns the issues."""
+    issues = profile.issues
+    vertical = profile.verticalAngles
+    horizontal = profile.horizontalAngles
+
+    if not (np.all(np.isfinite(vertical)) and np.all(np.isfinite(horizontal))):
+        issues.append((ISSUE_ERROR, "angles that aren't numbers"))
+    if not np.all(np.isfinite(profile.candela)):
+        count = int(np.sum(~np.isfinite(profile.candela)))
+        issues.append((ISSUE_ERROR, f"{count} candela values that aren't numbers"))
+    if np.any(np.diff(vertical) <= 0):
+        issues.append((ISSUE_ERROR, "vertical angles are not in increasing order"))
+    if np.any(np.diff(horizontal) <= 0):
+        issues.append((ISSUE_ERROR, "horizontal angles are not in increasing order"))
+    if np.any(profile.candela < 0):
+        issues.append((ISSUE_ERROR, f"{int(np.sum(profile.candela < 0))} negative candela values"))
+    elif not np.any(profile.candela > 0):
+        issues.append((ISSUE_WARNING, "profile emits no light"))
+
+    if profile.photometricType == PHOTOMETRIC_TYPE_C:
+        if vertical[0] < 0 or vertical[-1] > 180:
+            issues.append((ISSUE_ERROR, "vertical angles outside 0 to 180"))
+        elif vertical[0] not in (0, 90) or vertical[-1] not in (90, 180):
+            issues.append((ISSUE_WARNING, f"vertical angles {vertical[0]:g} to {vertical[-1]:g} aren't a standard range"))
+        if horizontal[0] < 0 or horizontal[-1] > 360:
+            issues.append((ISSUE_ERROR, "horizontal angles outside 0 to 360"))
+        elif horizontal[0] not in (0, 90) or horizontal[-1] not in (0, 90, 180, 270, 360):
+            issues.append((ISSUE_WARNING, f"horizontal angles {horizontal[0]:g} to {horizontal[-1]:g} aren't a standard range"))
+    elif profile.photometricType in (PHOTOMETRIC_TYPE_B, PHOTOMETRIC_TYPE_A):
+        issues.append((ISSUE_WARNING, "Type A/B photometry, only Type C profiles get metrics"))
+    else:
+        issues.append((ISSUE_ERROR, f"unknown photometric type {profile.photometricType}"))
+
+    # TILT is NONE, INCLUDE or the name of a separate tilt file next to the profile
+    tilt = profile.tilt
+    if tilt.upper() == "INCLUDE":
+        if len(profile.tiltAngles) == 0:
+            issues.append((ISSUE_ERROR, "TILT=INCLUDE block has no angles"))
+        elif np.any(np.diff(profile.tiltAngles) <= 0):
+            issues.append((ISSUE_ERROR, "TILT angles are not in increasing order"))
+        if profile.tiltFactors is not None and np.any(profile.tiltFactors < 0):
+            issues.append((ISSUE_ERROR, "negative TILT multiplying factors"))
+    elif tilt.upper() != "NONE":
+        tiltPath = os.path.join(os.path.dirname(profile.path), tilt)
+        if not profile.path or not os.path.isfile(tiltPath):
+            issues.append((ISSUE_ERROR, f"TILT file '{tilt}' not found"))
+
+    if profile.multiplier <= 0:
+        issues.append((ISSUE_ERROR, f"candela multiplier is {profile.multiplier:g}"))
+    if profile.lamps < 1:
+        issues.append((ISSUE_WARNING, f"number of lamps is {profile.lamps}"))
+    if profile.ballastFactor <= 0 or profile.inputWatts < 0:
+        issues.append((ISSUE_WARNING, "ballast factor or input watts are negative or zero"))
+    return issues
+
+
+def readIESFile(path: str) -> IESProfile:
+    """Reads and parses the IES file at 'path'."""
+    with open(path, "rb") as iesFile:
+        data = iesFile.read()
+    return parseIESBytes(data, os.path.basename(path), path)
+
+
+def parseIESBytes(data: bytes, name="", path="") -> IESProfile:
+    """Parses raw IES file contents and records their content hash."""
+    profile = parseIES(data.decode("latin-1"), name, path)
+    profile.contentHash = contentHash(data)
+    return profile
+
+
+def readIESDirectory(directory: str) -> dict:
+    """Parses every .ies file in 'directory'. Returns a dictionary of
+    file name to IESProfile, files that fail to parse are skipped."""
+    profiles = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith(".ies") or not entry.is_file():
+                continue
+            try:
+                profiles[entry.name] = readIESFile(entry.path)
+            except IESParseError as error:
+                print(error)
+    return dict(sorted(profiles.items()))
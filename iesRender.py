@@ -0,0 +1,131 @@
+"""Analytic thumbnail renderer for IES profiles.
+
+Renders the library's thumbnail look, a light close to a back wall lighting
+the wall and the floor in front of it, straight from the candela data
+without Maya or a render engine. Direct light only: each pixel's
+irradiance is the candela towards it, times the cosine of incidence over
+the squared distance.
+
+The scene geometry doesn't depend on the profile, so the light direction,
+falloff and table lookup of every pixel are worked out once per image
+size. Rendering a profile then only resamples its candela onto a regular
+angle table and gathers from it, a few milliseconds per thumbnail.
+"""
+
+import os
+
+import numpy as np
+
+import iesInterpolation
+import pngImage
+
+# Scene layout in metres, y up and the wall on the z = 0 plane
+cameraPosition = np.array([0.0, 1.0, 5.0])
+focalLength = 1.57
+lightPosition = np.array([0.0, 3.0, 0.25])
+
+# Resolution of the regular angle table profiles are resampled to
+tableVerticalStep = 0.5
+tableHorizontalStep = 2.0
+
+# Bump when the scene or shading changes so existing thumbnails are re-rendered
+SCENE_VERSION = "analytic-1"
+THUMBNAIL_SIZE = 256
+
+# Fraction of pixels that may clip to white after exposure
+EXPOSURE_QUANTILE = 0.995
+
+
+class ThumbnailScene:
+    """Per-pixel geometry of the thumbnail scene at one image size."""
+
+    __slots__ = ("size", "indices", "weights", "falloff")
+
+    def __init__(self, size: int = 256):
+        self.size = size
+
+        # Camera rays through each pixel centre, looking towards the wall
+        screen = (np.arange(size) + 0.5) / size * 2 - 1
+        screenX, screenY = np.meshgrid(screen, -screen)
+        rays = np.stack(
+            (screenX, screenY, np.full_like(screenX, -focalLength)), axis=-1
+        ).reshape(-1, 3)
+
+        # Every ray reaches the wall, rays pointing down may hit the floor first
+        wallDistance = cameraPosition[2] / focalLength
+        with np.errstate(divide="ignore"):
+            floorDistance = np.where(rays[:, 1] < 0, -cameraPosition[1] / rays[:, 1], np.inf)
+        onFloor = floorDistance < wallDistance
+        points = cameraPosition + rays * np.where(onFloor, floorDistance, wallDistance)[:, None]
+
+        toPoint = points - lightPosition
+        distance = np.linalg.norm(toPoint, axis=1)
+        unit = toPoint / distance[:, None]
+
+        # Cosine of incidence on the wall (normal +z) or floor (normal +y)
+        incidence = np.where(onFloor, -unit[:, 1], -unit[:, 2])
+        self.falloff = (np.maximum(incidence, 0.0) / distance**2).astype(np.float32)
+
+        # Type C angles, vertical 0 straight down, horizontal 0 along +x
+        vertical = np.degrees(np.arccos(np.clip(-unit[:, 1], -1.0, 1.0)))
+        horizontal = np.degrees(np.arctan2(unit[:, 2], unit[:, 0])) % 360.0
+
+        # Bilinear lookup into the angle table
+        verticalCount = tableVerticals().size
+        v = vertical / tableVerticalStep
+        h = horizontal / tableHorizontalStep
+        v0 = np.minimum(v.astype(np.intp), verticalCount - 2)
+        h0 = np.minimum(h.astype(np.intp), tableHorizontals().size - 2)
+        dv, dh = v - v0, h - h0
+        base = h0 * verticalCount + v0
+        self.indices = np.stack((base, base + 1, base + verticalCount, base + verticalCount + 1))
+        self.weights = np.stack(
+            ((1 - dh) * (1 - dv), (1 - dh) * dv, dh * (1 - dv), dh * dv)
+        ).astype(np.float32)
+
+
+def tableVerticals() -> np.ndarray:
+    return np.arange(0.0, 180.0 + tableVerticalStep, tableVerticalStep)
+
+
+def tableHorizontals() -> np.ndarray:
+    return np.arange(0.0, 360.0 + tableHorizontalStep, tableHorizontalStep)
+
+
+def angleTable(profile) -> np.ndarray:
+    """Resamples a profile's candela onto the regular (horizontal, vertical)
+    angle table as a flat float32 array."""
+    horizontal, vertical = np.meshgrid(tableHorizontals(), tableVerticals(), indexing="ij")
+    directions = np.stack((vertical.ravel(), horizontal.ravel()), axis=1)
+    return iesInterpolation.interpolateCandela(profile, directions).astype(np.float32)
+
+
+def renderThumbnail(profile, scene: ThumbnailScene) -> np.ndarray:
+    """Renders a profile into a (size, size) uint8 grey image. The exposure is
+    set per image so dim and bright profiles both read clearly."""
+    table = angleTable(profile)
+    candela = np.einsum("ij,ij->j", table[scene.indices], scene.weights)
+    irradiance = candela * scene.falloff
+
+    white = np.quantile(irradiance, EXPOSURE_QUANTILE)
+    if white <= 0:
+        white = irradiance.max() or 1.0
+    exposed = np.clip(irradiance / white, 0.0, 1.0)
+    return (exposed ** (1 / 2.2) * 255 + 0.5).astype(np.uint8).reshape(scene.size, scene.size)
+
+
+def renderThumbnails(profiles: dict, outputDirectory: str, size: int = THUMBNAIL_SIZE, progress=None) -> list:
+    """Renders a dictionary of image name to IESProfile and writes each image
+    to 'outputDirectory' as <name>.png. 'progress' is called with
+    (done, total) after each image. Returns the paths written."""
+    os.makedirs(outputDirectory, exist_ok=True)
+    scene = ThumbnailScene(size)
+
+    paths = []
+    for done, (name, profile) in enumerate(profiles.items(), 1):
+        path = os.path.join(outputDirectory, name + ".png")
+        pngImage.writePNG(path, renderThumbnail(profile, scene))
+        paths.append(path)
+        if progress:
+            progress(done, len(profiles))
+    return paths
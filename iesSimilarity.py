@@ -0,0 +1,97 @@
+"""Finds profiles with a similar light distribution.
+
+Each profile is reduced to a fixed-size feature vector, its intensity curve
+sampled every 2.5 degrees and normalized to unit length, so profiles are
+compared by shape rather than brightness. The vectors of a library form a
+single float32 matrix and a query is one matrix-vector product followed by
+a partial sort, which stays in the millisecond range for 100k profiles.
+"""
+
+import os
+
+import numpy as np
+
+import iesMetrics
+
+FEATURES_NAME = "features.npz"
+
+# Every nth sample of the metrics grid is used as a feature
+featureStride = 5
+
+
+def featureVectors(profiles: list) -> np.ndarray:
+    """Returns an (profiles, features) float32 array of normalized intensity curves."""
+    if not profiles:
+        return np.zeros((0, len(iesMetrics.gridAngles[::featureStride])), np.float32)
+    curves = iesMetrics.intensityCurves(profiles)[:, ::featureStride]
+    norms = np.linalg.norm(curves, axis=1, keepdims=True)
+    return (curves / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+
+
+class SimilarityIndex:
+    """Exact nearest-neighbour index over profile feature vectors."""
+
+    __slots__ = ("names", "vectors", "rows")
+
+    def __init__(self, names: list, vectors: np.ndarray):
+        self.names = list(names)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.rows = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def similar(self, name: str, count: int = 12) -> list:
+        """Returns up to 'count' (file name, similarity) pairs closest to the
+        profile 'name', most similar first. The profile itself is excluded."""
+        row = self.rows.get(name)
+        if row is None:
+            return []
+        scores = self.vectors @ self.vectors[row]
+        scores[row] = -np.inf
+        count = min(count, len(self.names) - 1)
+        if count <= 0:
+            return []
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best])]
+        return [(self.names[i], float(scores[i])) for i in best]
+
+
+def buildSimilarityIndex(profiles: dict, cacheDirectory: str = None) -> SimilarityIndex:
+    """Builds the index for a dictionary of file name to IESProfile. When a
+    cache directory is given, feature vectors are stored there by content
+    hash and only computed for profiles that aren't cached yet."""
+
+    names = list(profiles)
+    hashes = [profiles[name].contentHash for name in names]
+
+    cached = {}
+    featuresPath = os.path.join(cacheDirectory, FEATURES_NAME) if cacheDirectory else None
+    if featuresPath and os.path.isfile(featuresPath):
+        try:
+            with np.load(featuresPath) as features:
+                cached = dict(zip(features["hashes"].tolist(), features["vectors"]))
+        except (OSError, ValueError, KeyError):
+            cached = {}
+
+    missing = [name for name, profileHash in zip(names, hashes) if profileHash not in cached]
+    if missing:
+        for name, vector in zip(missing, featureVectors([profiles[name] for name in missing])):
+            cached[profiles[name].contentHash] = vector
+
+    width = len(iesMetrics.gridAngles[::featureStride])
+    vectors = np.array([cached[profileHash] for profileHash in hashes], dtype=np.float32)
+    vectors = vectors.reshape(len(names), width)
+
+    if featuresPath and (missing or len(cached) != len(set(hashes))):
+        os.makedirs(cacheDirectory, exist_ok=True)
+        uniqueHashes = sorted(set(hashes))
+        np.savez(
+            featuresPath,
+            hashes=np.array(uniqueHashes),
+            vectors=np.array([cached[profileHash] for profileHash in uniqueHashes]).reshape(
+                len(uniqueHashes), width
+            ),
+        )
+
+    return SimilarityIndex(names, vectors)
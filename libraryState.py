@@ -0,0 +1,106 @@
+"""Snapshot of the files in a library folder, used to rescan incrementally.
+
+One os.scandir pass records (size, mtime) for each file. Later refreshes
+compare a new pass against the snapshot and only report what was added,
+removed or changed, so callers can update just the affected items. Files
+can also be looked up by name without touching the disk, ignoring case.
+"""
+
+import os
+from collections import namedtuple
+
+LibraryChanges = namedtuple("LibraryChanges", ["added", "removed", "changed"])
+
+
+class LibraryState:
+    """Tracks the files with a given extension in 'directory'."""
+
+    __slots__ = ("directory", "extension", "entries", "foldedNames")
+
+    def __init__(self, directory: str, extension: str = ".ies"):
+        self.directory = directory
+        self.extension = extension.lower()
+        self.entries = {}  # file name -> (size, mtime in nanoseconds)
+        self.foldedNames = {}  # lower case file name -> file name
+
+    def scan(self) -> dict:
+        """Lists the folder once and returns file name -> (size, mtime)."""
+        entries = {}
+        try:
+            with os.scandir(self.directory) as directoryEntries:
+                for entry in directoryEntries:
+                    if not entry.name.lower().endswith(self.extension):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def refresh(self) -> LibraryChanges:
+        """Rescans the folder, updates the snapshot and returns the differences
+        from the previous snapshot. The first refresh reports every file as added."""
+        entries = self.scan()
+        previous = self.entries
+
+        added = sorted((name for name in entries if name not in previous), key=str.lower)
+        removed = sorted((name for name in previous if name not in entries), key=str.lower)
+        changed = sorted(
+            (name for name in entries if name in previous and entries[name] != previous[name]),
+            key=str.lower,
+        )
+
+        self.entries = entries
+        self.foldedNames = {name.lower(): name for name in sorted(entries, reverse=True)}
+        return LibraryChanges(added, removed, changed)
+
+    def update(self, names) -> LibraryChanges:
+        """Re-checks a few files, for example ones that were just written,
+        without listing the whole folder. Returns the differences like refresh."""
+        added, removed, changed = [], [], []
+        for name in names:
+            try:
+                stat = os.stat(self.path(name))
+                entry = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                entry = None
+            previous = self.entries.get(name)
+            if entry is None:
+                if previous is not None:
+                    del self.entries[name]
+                    removed.append(name)
+                    if self.foldedNames.get(name.lower()) == name:
+                        # Fall back to another spelling of the same name
+                        others = [other for other in self.entries if other.lower() == name.lower()]
+                        if others:
+                            self.foldedNames[name.lower()] = others[0]
+                        else:
+                            del self.foldedNames[name.lower()]
+                continue
+            if previous is None:
+                added.append(name)
+                self.foldedNames.setdefault(name.lower(), name)
+            elif previous != entry:
+                changed.append(name)
+            self.entries[name] = entry
+        return LibraryChanges(added, removed, changed)
+
+    def find(self, name: str) -> str:
+        """Returns the name of the file matching 'name', ignoring case, None if
+        there's no such file. An exact match wins over other spellings."""
+        if name in self.entries:
+            return name
+        return self.foldedNames.get(name.lower())
+
+    def names(self) -> list:
+        """File names in the current snapshot, sorted without case."""
+        return sorted(self.entries, key=str.lower)
+
+    def path(self, name: str) -> str:
+        """Full path of a file in the library."""
+        return os.path.join(self.directory, name)
@@ -0,0 +1,198 @@
+"""Reads and writes 8-bit PNG images as NumPy arrays using only zlib.
+
+Lets thumbnails and plots be saved from mayapy or plain Python without an
+imaging library. Rows use the PNG 'Up' filter, computed for the whole
+image at once, which compresses smooth renders well. Reading undoes every
+PNG filter, rows that use the None, Sub or Up filters (what renderers
+write) are decoded without a per-pixel loop.
+"""
+
+import os
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+# PNG colour types by number of channels
+colourTypes = {1: 0, 2: 4, 3: 2, 4: 6}
+# Number of channels by PNG colour type, palette images have one index channel
+colourChannels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def pngChunk(chunkType: bytes, data: bytes) -> bytes:
+    """Returns a length-prefixed PNG chunk with its CRC."""
+    return (
+        struct.pack(">I", len(data))
+        + chunkType
+        + data
+        + struct.pack(">I", zlib.crc32(chunkType + data) & 0xFFFFFFFF)
+    )
+
+
+def encodePNG(pixels: np.ndarray, level: int = 6) -> bytes:
+    """Encodes an (height, width) grey or (height, width, channels) uint8
+    array with 1 to 4 channels as PNG file contents."""
+    pixels = np.asarray(pixels, dtype=np.uint8)
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    height, width, channels = pixels.shape
+    if channels not in colourTypes:
+        raise ValueError(f"{channels} channels can't be written as a PNG")
+
+    # Up filter, each row stores the difference to the row above it
+    rows = pixels.reshape(height, width * channels)
+    filtered = np.empty((height, width * channels + 1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[0, 1:] = rows[0]
+    filtered[1:, 1:] = rows[1:] - rows[:-1]
+
+    header = struct.pack(">IIBBBBB", width, height, 8, colourTypes[channels], 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + pngChunk(b"IHDR", header)
+        + pngChunk(b"IDAT", zlib.compress(filtered.tobytes(), level))
+        + pngChunk(b"IEND", b"")
+    )
+
+
+def writePNG(path: str, pixels: np.ndarray, level: int = 6) -> None:
+    """Writes a uint8 array to 'path' as a PNG image. The file is replaced
+    rather than overwritten, so images hard linked to it are left untouched.
+    Each write goes through its own temporary file, so two writers of the
+    same image can't replace it with a half written one."""
+    handle, temporaryPath = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(handle, "wb") as pngFile:
+            pngFile.write(encodePNG(pixels, level))
+        os.replace(temporaryPath, path)
+    except BaseException:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+
+
+def readChunks(data: bytes):
+    """Yields (chunk type, data) for each chunk of PNG file contents."""
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("not a PNG file")
+    position = 8
+    while position + 8 <= len(data):
+        length, chunkType = struct.unpack(">I4s", data[position : position + 8])
+        yield chunkType, data[position + 8 : position + 8 + length]
+        position += length + 12
+
+
+def unfilterRow(filterType: int, row: np.ndarray, previous: np.ndarray, pixelBytes: int) -> np.ndarray:
+    """Undoes the PNG filter of one row of bytes, 'previous' is the decoded row above."""
+    if filterType == 0:
+        return row
+    if filterType == 2:
+        return row + previous
+    if filterType == 1:
+        pixels = row.reshape(-1, pixelBytes).astype(np.uint32)
+        return (np.cumsum(pixels, axis=0) & 0xFF).astype(np.uint8).reshape(-1)
+
+    # Average and Paeth depend on the decoded pixel to the left
+    decoded = bytearray(row.tobytes())
+    above = previous.tobytes()
+    for i in range(len(decoded)):
+        left = decoded[i - pixelBytes] if i >= pixelBytes else 0
+        if filterType == 3:
+            decoded[i] = (decoded[i] + ((left + above[i]) >> 1)) & 0xFF
+            continue
+        upperLeft = above[i - pixelBytes] if i >= pixelBytes else 0
+        estimate = left + above[i] - upperLeft
+        distanceLeft, distanceUp, distanceUpperLeft = (
+            abs(estimate - left),
+            abs(estimate - above[i]),
+            abs(estimate - upperLeft),
+        )
+        if distanceLeft <= distanceUp and distanceLeft <= distanceUpperLeft:
+            predictor = left
+        elif distanceUp <= distanceUpperLeft:
+            predictor = above[i]
+        else:
+            predictor = upperLeft
+        decoded[i] = (decoded[i] + predictor) & 0xFF
+    return np.frombuffer(bytes(decoded), dtype=np.uint8)
+
+
+def decodePNG(data: bytes) -> np.ndarray:
+    """Decodes PNG file contents to a (height, width, channels) uint8 array.
+    Palette images are expanded to RGB or RGBA, 16-bit images are reduced to
+    8 bits. Interlaced and sub-byte images aren't supported."""
+    compressed = []
+    palette = transparency = None
+    for chunkType, chunkData in readChunks(data):
+        if chunkType == b"IHDR":
+            width, height, bitDepth, colourType, _compression, _filter, interlace = struct.unpack(
+                ">IIBBBBB", chunkData
+            )
+        elif chunkType == b"PLTE":
+            palette = np.frombuffer(chunkData, dtype=np.uint8).reshape(-1, 3)
+        elif chunkType == b"tRNS":
+            transparency = np.frombuffer(chunkData, dtype=np.uint8)
+        elif chunkType == b"IDAT":
+            compressed.append(chunkData)
+        elif chunkType == b"IEND":
+            break
+    if interlace or bitDepth not in (8, 16) or colourType not in colourChannels:
+        raise ValueError(f"unsupported PNG, bit depth {bitDepth}, colour type {colourType}, interlace {interlace}")
+
+    channels = colourChannels[colourType]
+    pixelBytes = channels * bitDepth // 8
+    stride = width * pixelBytes
+    raw = np.frombuffer(zlib.decompress(b"".join(compressed)), dtype=np.uint8).reshape(height, stride + 1)
+    filters = raw[:, 0]
+    rows = raw[:, 1:]
+
+    if not filters.any():
+        image = rows
+    else:
+        image = np.empty((height, stride), dtype=np.uint8)
+        previous = np.zeros(stride, dtype=np.uint8)
+        for y in range(height):
+            previous = image[y] = unfilterRow(int(filters[y]), rows[y], previous, pixelBytes)
+
+    image = image.reshape(height, width, pixelBytes)
+    if bitDepth == 16:
+        image = image[:, :, 0::2]
+    if colourType == 3:
+        indices = image[:, :, 0]
+        if transparency is not None:
+            alpha = np.full(len(palette), 255, dtype=np.uint8)
+            alpha[: len(transparency)] = transparency
+            return np.dstack([palette[indices], alpha[indices]])
+        return palette[indices]
+    return np.ascontiguousarray(image)
+
+
+def readPNG(path: str) -> np.ndarray:
+    """Reads a PNG image as a (height, width, channels) uint8 array."""
+    with open(path, "rb") as pngFile:
+        return decodePNG(pngFile.read())
+
+
+def resizeImage(pixels: np.ndarray, size: int) -> np.ndarray:
+    """Scales an image so its longest side is 'size' pixels. Each new pixel is
+    the average of the pixels it covers, so downscaled renders don't alias.
+    Images smaller than 'size' are enlarged by repeating pixels."""
+    pixels = np.asarray(pixels)
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    height, width = pixels.shape[:2]
+    scale = size / max(height, width)
+    newHeight, newWidth = max(1, round(height * scale)), max(1, round(width * scale))
+
+    resized = pixels.astype(np.float32)
+    for axis, length, newLength in ((0, height, newHeight), (1, width, newWidth)):
+        starts = (np.arange(newLength) * length) // newLength
+        if newLength >= length:
+            # Every new pixel covers part of a single pixel, nearest neighbour
+            resized = np.take(resized, starts, axis=axis)
+            continue
+        counts = np.diff(np.append(starts, length)).astype(np.float32)
+        counts = counts.reshape((-1, 1, 1) if axis == 0 else (1, -1, 1))
+        resized = np.add.reduceat(resized, starts, axis=axis) / counts
+    return np.clip(resized + 0.5, 0, 255).astype(np.uint8)
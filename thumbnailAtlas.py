@@ -0,0 +1,149 @@
+"""Packs the card thumbnails of one pyramid size into a few atlas pages.
+
+A page is a PAGE_SIZE square PNG holding a grid of thumbnails, and the
+index IES_cache/atlas/atlas_<size>.json maps each image name to its page,
+cell and size. The browser reads a page once and cuts every card on it out
+of memory, instead of opening one file per card, which is much faster on a
+network share.
+
+Updates are incremental: only pages holding new or changed thumbnails are
+rewritten, and the cells of removed thumbnails are reused.
+"""
+
+import json
+import os
+
+import numpy as np
+
+import pngImage
+import thumbnailPyramid
+
+ATLAS_FOLDER = "atlas"
+ATLAS_VERSION = 1
+PAGE_SIZE = 2048
+
+
+def indexPath(cacheDirectory: str, size: int) -> str:
+    return f"{cacheDirectory}/{ATLAS_FOLDER}/atlas_{size}.json"
+
+
+def pagePath(cacheDirectory: str, size: int, page: int) -> str:
+    return f"{cacheDirectory}/{ATLAS_FOLDER}/atlas_{size}_{page}.png"
+
+
+def readIndex(cacheDirectory: str, size: int) -> dict:
+    """Reads the atlas index of a thumbnail size, returns an empty one if it's missing or outdated."""
+    emptyIndex = {"version": ATLAS_VERSION, "size": size, "pages": 0, "images": {}}
+    try:
+        with open(indexPath(cacheDirectory, size), "r") as indexFile:
+            index = json.load(indexFile)
+    except (OSError, ValueError):
+        return emptyIndex
+    if index.get("version") != ATLAS_VERSION or index.get("size") != size:
+        return emptyIndex
+    return index
+
+
+def writeIndex(cacheDirectory: str, index: dict) -> None:
+    temporaryIndex = indexPath(cacheDirectory, index["size"]) + ".tmp"
+    with open(temporaryIndex, "w") as indexFile:
+        json.dump(index, indexFile)
+    os.replace(temporaryIndex, indexPath(cacheDirectory, index["size"]))
+
+
+def cellsPerRow(size: int) -> int:
+    return PAGE_SIZE // size
+
+
+def cellRect(index: dict, name: str):
+    """Returns (page, x, y, width, height) of an image in the atlas, None if it isn't packed."""
+    entry = index["images"].get(name)
+    if entry is None:
+        return None
+    page, cell, width, height, _written = entry
+    row, column = divmod(cell, cellsPerRow(index["size"]))
+    return page, column * index["size"], row * index["size"], width, height
+
+
+def rgbaPixels(pixels: np.ndarray) -> np.ndarray:
+    """Expands grey, grey and alpha or RGB pixels to RGBA."""
+    channels = pixels.shape[2]
+    if channels == 4:
+        return pixels
+    colour = pixels[:, :, :1].repeat(3, axis=2) if channels <= 2 else pixels[:, :, :3]
+    if channels == 2:
+        alpha = pixels[:, :, 1:]
+    else:
+        alpha = np.full(pixels.shape[:2] + (1,), 255, dtype=np.uint8)
+    return np.concatenate([colour, alpha], axis=2)
+
+
+def freeCells(index: dict):
+    """Yields (page, cell) of every unused cell, continuing onto new pages."""
+    used = {(entry[0], entry[1]) for entry in index["images"].values()}
+    cells = cellsPerRow(index["size"]) ** 2
+    page = 0
+    while True:
+        for cell in range(cells):
+            if (page, cell) not in used:
+                yield page, cell
+        page += 1
+
+
+def updateAtlas(cacheDirectory: str, size: int, names=None) -> dict:
+    """Packs new and changed pyramid images of 'size' into the atlas and
+    returns its index. 'names' limits the update to a few images, otherwise
+    the whole pyramid level is checked and removed images are unpacked."""
+    os.makedirs(f"{cacheDirectory}/{ATLAS_FOLDER}", exist_ok=True)
+    index = readIndex(cacheDirectory, size)
+    images = index["images"]
+
+    if names is None:
+        levels = thumbnailPyramid.levelTimes(cacheDirectory, size)
+        removed = set(images) - set(levels)
+    else:
+        levels = {
+            name: thumbnailPyramid.modifiedTime(thumbnailPyramid.levelPath(cacheDirectory, size, name))
+            for name in names
+        }
+        removed = {name for name, written in levels.items() if written < 0 and name in images}
+        levels = {name: written for name, written in levels.items() if written >= 0}
+    changed = [name for name, written in levels.items() if name not in images or images[name][4] != written]
+    if not changed and not removed:
+        return index
+
+    for name in removed:
+        del images[name]
+
+    pages = {}
+    cells = freeCells(index)
+    perRow = cellsPerRow(size)
+    for name in changed:
+        try:
+            pixels = rgbaPixels(pngImage.readPNG(thumbnailPyramid.levelPath(cacheDirectory, size, name)))
+        except (OSError, ValueError, KeyError):
+            images.pop(name, None)
+            continue
+        if name in images:
+            page, cell = images[name][:2]
+        else:
+            page, cell = next(cells)
+        if page not in pages:
+            path = pagePath(cacheDirectory, size, page)
+            pages[page] = (
+                pngImage.readPNG(path)
+                if os.path.exists(path)
+                else np.zeros((PAGE_SIZE, PAGE_SIZE, 4), dtype=np.uint8)
+            )
+        row, column = divmod(cell, perRow)
+        height, width = pixels.shape[:2]
+        cellPixels = pages[page][row * size : (row + 1) * size, column * size : (column + 1) * size]
+        cellPixels[:] = 0
+        cellPixels[:height, :width] = pixels
+        images[name] = [page, cell, width, height, levels[name]]
+
+    for page, pixels in pages.items():
+        pngImage.writePNG(pagePath(cacheDirectory, size, page), pixels)
+    index["pages"] = max([entry[0] + 1 for entry in images.values()], default=0)
+    writeIndex(cacheDirectory, index)
+    return index
@@ -0,0 +1,460 @@
+"""Resumable, pipelined thumbnail render job.
+
+The job is stored in IES_cache/thumbnailJob.json with the state of every
+profile: pending, running, done or failed. The profiles that aren't done are
+split into shards that each go through three stages in their own copy of
+the thumbnail scene:
+
+    build    mayapy runs IESmayaSceneSetup.py to add the shard's lights
+    render   Maya's command line renderer renders one frame per profile
+    cleanup  the scene copy and temporary images are removed
+
+The stages are pipelined: the next shard's scene is built while earlier
+shards render and finished shards are cleaned up. Up to 'workers' shards
+render side by side. Every frame is moved into IES_images as soon as the
+renderer starts on the next one, so a crashed or cancelled job resumes from
+the last finished frame instead of starting over. Creating
+IES_cache/thumbnailJob.cancel stops a running job.
+
+The output of every stage is streamed into IES_cache/thumbnailJob.log as
+JSON lines. The commands of each stage are templates stored in the job, so
+other renderers or local stand-ins can be plugged in.
+
+Runs on Windows, Linux and macOS with mayapy or any Python 3 interpreter.
+
+Usage:
+    mayapy thumbnailJob.py <IES_cache folder>
+"""
+
+import json
+import os
+import platform
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import iesFrameSwitch
+
+JOB_NAME = "thumbnailJob.json"
+CANCEL_NAME = "thumbnailJob.cancel"
+LOG_NAME = "thumbnailJob.log"
+JOB_VERSION = 2
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Seconds between checks for finished frames and cancel requests, a job whose
+# heartbeat is older than staleAfter is no longer running
+pollInterval = 1.0
+staleAfter = 15.0
+
+# Frames per shard. Small shards waste time building scenes, large ones keep
+# the pipeline from overlapping stages
+minimumShardSize = 8
+maximumShardSize = 50
+
+# Stage commands, each argument is formatted with the shard's values:
+# {mayapy} {render} {library} {renderer} {names} {frames} {scene} {folder}
+defaultCommands = {
+    "build": [
+        "{mayapy}", "{library}/IESmayaSceneSetup.py", "{names}", "{library}", "{renderer}", "True", "{scene}",
+    ],
+    "render": [
+        "{render}", "-r", "{renderer}", "-cam", "renderCam", "-s", "1", "-e", "{frames}", "-rd", "{folder}/",
+        "{library}{scene}",
+    ],
+    "notify": ["{mayapy}", "{library}/windowsNotification.py"] if platform.system() == "Windows" else [],
+}
+
+
+def readJob(cacheDirectory: str) -> dict:
+    """Returns the stored job, None if there's no job."""
+    try:
+        with open(os.path.join(cacheDirectory, JOB_NAME), "r") as jobFile:
+            job = json.load(jobFile)
+    except (OSError, ValueError):
+        return None
+    if job.get("version") != JOB_VERSION:
+        return None
+    return job
+
+
+def writeJob(cacheDirectory: str, job: dict) -> None:
+    temporaryJob = os.path.join(cacheDirectory, JOB_NAME + ".tmp")
+    with open(temporaryJob, "w") as jobFile:
+        json.dump(job, jobFile)
+    os.replace(temporaryJob, os.path.join(cacheDirectory, JOB_NAME))
+
+
+def createJob(
+    cacheDirectory: str,
+    libraryDirectory: str,
+    renderer: str,
+    duplicates: dict,
+    mayapy: str,
+    render: str,
+    workers: int = 4,
+    commands: dict = None,
+) -> dict:
+    """Writes a new job rendering each profile in 'duplicates' (profile name ->
+    names of duplicates that share its image) and returns it. 'commands'
+    replaces some or all of the defaultCommands templates."""
+    os.makedirs(cacheDirectory, exist_ok=True)
+    for fileName in (CANCEL_NAME, LOG_NAME):
+        if os.path.exists(os.path.join(cacheDirectory, fileName)):
+            os.remove(os.path.join(cacheDirectory, fileName))
+    job = {
+        "version": JOB_VERSION,
+        "library": libraryDirectory,
+        "renderer": renderer,
+        "mayapy": mayapy,
+        "render": render,
+        "workers": workers,
+        "commands": dict(defaultCommands, **(commands or {})),
+        "heartbeat": 0.0,
+        "profiles": {
+            name: {"state": PENDING, "duplicates": list(names), "shard": 0, "frame": 0}
+            for name, names in duplicates.items()
+        },
+    }
+    writeJob(cacheDirectory, job)
+    return job
+
+
+def jobProgress(job: dict) -> dict:
+    """Returns the number of profiles in each state, and the 'total'."""
+    counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+    for profile in job["profiles"].values():
+        counts[profile["state"]] += 1
+    counts["total"] = len(job["profiles"])
+    return counts
+
+
+def isRunning(job: dict) -> bool:
+    """True while a runner is updating the job's heartbeat."""
+    return time.time() - job.get("heartbeat", 0.0) < staleAfter
+
+
+def isFinished(job: dict) -> bool:
+    return all(profile["state"] == DONE for profile in job["profiles"].values())
+
+
+def requestCancel(cacheDirectory: str) -> None:
+    """Asks a running job to stop, finished frames are kept."""
+    with open(os.path.join(cacheDirectory, CANCEL_NAME), "w"):
+        pass
+
+
+def frameNumber(fileName: str) -> int:
+    """Frame of a rendered image such as 'light_.0004.png', 0 if it has none."""
+    numbers = re.findall(r"\d+", os.path.splitext(fileName)[0])
+    return int(numbers[-1]) if numbers else 0
+
+
+def renderedFrames(folder: str) -> dict:
+    """Returns frame number -> image path of every image rendered into 'folder'."""
+    frames = {}
+    for directory, _folders, files in os.walk(folder):
+        for fileName in files:
+            if fileName.lower().endswith(".png"):
+                frames[frameNumber(fileName)] = os.path.join(directory, fileName)
+    return frames
+
+
+def publishImage(source: str, imageDirectory: str, name: str, duplicates: list) -> None:
+    """Moves a rendered frame into the image folder as <name>.png, replacing an
+    outdated thumbnail, and hard links it to each duplicate."""
+    destination = os.path.join(imageDirectory, name + ".png")
+    os.replace(source, destination)
+    for duplicate in duplicates:
+        duplicateFile = os.path.join(imageDirectory, duplicate + ".png")
+        if os.path.exists(duplicateFile):
+            os.remove(duplicateFile)
+        try:
+            os.link(destination, duplicateFile)
+        except OSError:
+            shutil.copyfile(destination, duplicateFile)
+
+
+class ThumbnailJob:
+    """Runs or resumes the job stored in a cache folder."""
+
+    __slots__ = ("cacheDirectory", "job", "lock", "logLock", "processes", "cancelled")
+
+    def __init__(self, cacheDirectory: str):
+        self.cacheDirectory = cacheDirectory
+        self.job = readJob(cacheDirectory)
+        self.lock = threading.Lock()
+        self.logLock = threading.Lock()
+        self.processes = []
+        self.cancelled = False
+
+    @property
+    def library(self) -> str:
+        return self.job["library"]
+
+    @property
+    def imageDirectory(self) -> str:
+        return self.library + "/IES_images"
+
+    def log(self, shardNumber: int, stage: str, event: str, **details) -> None:
+        """Appends an event to the job log and echoes it to the console."""
+        record = dict(time=round(time.time(), 3), shard=shardNumber, stage=stage, event=event, **details)
+        with self.logLock:
+            with open(os.path.join(self.cacheDirectory, LOG_NAME), "a") as logFile:
+                logFile.write(json.dumps(record) + "\n")
+            message = details.get("line", " ".join(f"{key}={value}" for key, value in details.items()))
+            print(f"[shard {shardNumber} {stage}] {event} {message}".rstrip())
+            sys.stdout.flush()
+
+    def save(self) -> None:
+        with self.lock:
+            self.job["heartbeat"] = time.time()
+            writeJob(self.cacheDirectory, self.job)
+
+    def setState(self, names, state: str) -> None:
+        with self.lock:
+            for name in names:
+                self.job["profiles"][name]["state"] = state
+        self.save()
+
+    def checkCancel(self) -> bool:
+        if not self.cancelled and os.path.exists(os.path.join(self.cacheDirectory, CANCEL_NAME)):
+            self.log(0, "job", "cancel")
+            self.cancelled = True
+            for process in list(self.processes):
+                if process.poll() is None:
+                    process.terminate()
+        return self.cancelled
+
+    def command(self, stage: str, shardNumber: int, names: list) -> list:
+        """Fills in the command template of a stage for a shard."""
+        values = {
+            "mayapy": self.job["mayapy"],
+            "render": self.job["render"],
+            "library": self.library,
+            "renderer": self.job["renderer"],
+            "names": ",".join(names),
+            "frames": len(names),
+            "scene": f"/IESMakeThumbnails{shardNumber}.ma",
+            "folder": f"{self.imageDirectory}/Temp{shardNumber}",
+        }
+        return [argument.format(**values) for argument in self.job["commands"][stage]]
+
+    def runStage(self, shardNumber: int, stage: str, command: list, whileRunning=None) -> int:
+        """Runs a stage's command, streaming its output into the log line by
+        line. 'whileRunning' is called every poll until it exits. Returns the
+        exit code."""
+        self.log(shardNumber, stage, "start", command=subprocess.list2cmdline(command))
+        try:
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors="replace",
+            )
+        except OSError as error:
+            self.log(shardNumber, stage, "error", line=str(error))
+            return -1
+        self.processes.append(process)
+
+        def streamOutput():
+            for line in process.stdout:
+                self.log(shardNumber, stage, "output", line=line.rstrip())
+
+        reader = threading.Thread(target=streamOutput, daemon=True)
+        reader.start()
+        while process.poll() is None:
+            time.sleep(pollInterval)
+            self.checkCancel()
+            if whileRunning:
+                whileRunning()
+        reader.join()
+        self.processes.remove(process)
+        self.log(shardNumber, stage, "exit", code=process.returncode)
+        return process.returncode
+
+    def recoverFrames(self) -> None:
+        """Publishes frames a crashed run finished before it stopped. The last
+        frame of each shard may be incomplete and is rendered again."""
+        profiles = self.job["profiles"]
+        shards = {}
+        for name, profile in profiles.items():
+            if profile["state"] != DONE and profile["shard"]:
+                shards.setdefault(profile["shard"], {})[profile["frame"]] = name
+        for shardNumber, frameNames in shards.items():
+            folder = f"{self.imageDirectory}/Temp{shardNumber}"
+            frames = renderedFrames(folder)
+            for frame in sorted(frames)[:-1]:
+                name = frameNames.get(frame)
+                if name:
+                    publishImage(frames[frame], self.imageDirectory, name, profiles[name]["duplicates"])
+                    profiles[name]["state"] = DONE
+            shutil.rmtree(folder, ignore_errors=True)
+            self.removeScene(shardNumber)
+        self.save()
+
+    def removeScene(self, shardNumber: int) -> None:
+        """Removes a shard's scene copy and the frame list its light reads."""
+        scenePath = f"{self.library}/IESMakeThumbnails{shardNumber}.ma"
+        for path in (scenePath, iesFrameSwitch.frameListPath(scenePath)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def shards(self) -> list:
+        """Splits the profiles that aren't done into shards."""
+        remaining = [name for name, profile in self.job["profiles"].items() if profile["state"] != DONE]
+        shardSize = -(-len(remaining) // self.workers()) if remaining else 1
+        shardSize = max(minimumShardSize, min(shardSize, maximumShardSize))
+        shards = [remaining[start : start + shardSize] for start in range(0, len(remaining), shardSize)]
+
+        with self.lock:
+            for shardNumber, names in enumerate(shards, 1):
+                for frame, name in enumerate(names, 1):
+                    self.job["profiles"][name].update(state=PENDING, shard=shardNumber, frame=frame)
+        self.save()
+        return shards
+
+    def workers(self) -> int:
+        """Render processes run side by side, capped by the number of cores."""
+        return max(1, min(self.job["workers"], os.cpu_count() or 1))
+
+    def buildShard(self, shardNumber: int, names: list) -> bool:
+        shutil.copyfile(self.library + "/IESMakeThumbnails.ma", f"{self.library}/IESMakeThumbnails{shardNumber}.ma")
+        os.makedirs(f"{self.imageDirectory}/Temp{shardNumber}", exist_ok=True)
+        return self.runStage(shardNumber, "build", self.command("build", shardNumber, names)) == 0
+
+    def renderShard(self, shardNumber: int, names: list) -> None:
+        """Renders a shard, publishing frames as they finish."""
+        folder = f"{self.imageDirectory}/Temp{shardNumber}"
+        self.setState(names, RUNNING)
+        published = set()
+        returnCode = self.runStage(
+            shardNumber,
+            "render",
+            self.command("render", shardNumber, names),
+            whileRunning=lambda: self.publishFrames(folder, names, published, finished=False),
+        )
+        # A crashed renderer may have left its last frame half written, it's
+        # left unpublished and the cleanup stage marks it failed
+        self.publishFrames(folder, names, published, finished=returnCode == 0 and not self.cancelled)
+
+    def cleanupShard(self, shardNumber: int, names: list) -> None:
+        """Removes the shard's scene and temporary images and records frames that didn't render."""
+        self.log(shardNumber, "cleanup", "start")
+        unfinished = [name for name in names if self.job["profiles"][name]["state"] != DONE]
+        self.setState(unfinished, PENDING if self.cancelled else FAILED)
+        self.removeScene(shardNumber)
+        shutil.rmtree(f"{self.imageDirectory}/Temp{shardNumber}", ignore_errors=True)
+        self.log(shardNumber, "cleanup", "exit", done=len(names) - len(unfinished), total=len(names))
+
+    def publishFrames(self, folder: str, names: list, published: set, finished: bool) -> None:
+        """Publishes rendered frames. While the renderer runs, the newest frame
+        may still be written and is left until the next one appears."""
+        frames = renderedFrames(folder)
+        if not frames:
+            return
+        last = max(frames)
+        newlyDone = []
+        for frame, path in sorted(frames.items()):
+            if frame < 1 or frame > len(names) or (frame == last and not finished):
+                continue
+            name = names[frame - 1]
+            if name in published:
+                continue
+            publishImage(path, self.imageDirectory, name, self.job["profiles"][name]["duplicates"])
+            published.add(name)
+            newlyDone.append(name)
+        if newlyDone:
+            self.setState(newlyDone, DONE)
+
+    def run(self) -> bool:
+        """Renders every profile that isn't done yet. Returns True once all are done."""
+        self.log(0, "job", "start", renderer=self.job["renderer"])
+        self.recoverFrames()
+        shards = self.shards()
+        workers = self.workers()
+        self.log(0, "job", "shards", shards=len(shards), workers=workers)
+
+        # Build -> render -> cleanup, the render queue is bounded so scenes are
+        # only built a little ahead of the renderers
+        renderQueue = queue.Queue(maxsize=workers)
+        cleanupQueue = queue.Queue()
+
+        def buildStage():
+            for shardNumber, names in enumerate(shards, 1):
+                built = not self.checkCancel() and self.buildShard(shardNumber, names)
+                renderQueue.put((shardNumber, names, built))
+            for _worker in range(workers):
+                renderQueue.put(None)
+
+        def renderStage():
+            while True:
+                shard = renderQueue.get()
+                if shard is None:
+                    return
+                shardNumber, names, built = shard
+                if built and not self.checkCancel():
+                    self.renderShard(shardNumber, names)
+                cleanupQueue.put((shardNumber, names))
+
+        def cleanupStage():
+            while True:
+                shard = cleanupQueue.get()
+                if shard is None:
+                    return
+                self.cleanupShard(*shard)
+
+        stopHeartbeat = threading.Event()
+
+        def heartbeat():
+            # Keeps the heartbeat fresh while shards wait on long frames
+            while not stopHeartbeat.wait(pollInterval * 5):
+                self.save()
+
+        threads = [threading.Thread(target=heartbeat, daemon=True)]
+        builder = threading.Thread(target=buildStage)
+        renderers = [threading.Thread(target=renderStage) for _worker in range(workers)]
+        cleaner = threading.Thread(target=cleanupStage)
+        for thread in threads + [builder] + renderers + [cleaner]:
+            thread.start()
+        builder.join()
+        for renderer in renderers:
+            renderer.join()
+        cleanupQueue.put(None)
+        cleaner.join()
+        stopHeartbeat.set()
+
+        with self.lock:
+            self.job["heartbeat"] = 0.0
+            writeJob(self.cacheDirectory, self.job)
+        cancelPath = os.path.join(self.cacheDirectory, CANCEL_NAME)
+        if os.path.exists(cancelPath):
+            os.remove(cancelPath)
+
+        counts = jobProgress(self.job)
+        self.log(0, "job", "exit", done=counts[DONE], failed=counts[FAILED], total=counts["total"])
+        notify = self.command("notify", 0, [])
+        if notify and not self.cancelled:
+            self.runStage(0, "notify", notify)
+        return isFinished(self.job)
+
+
+if __name__ == "__main__":
+    thumbnailJob = ThumbnailJob(sys.argv[1])
+    if thumbnailJob.job is None:
+        sys.exit("No thumbnail job to run")
+    if isRunning(thumbnailJob.job):
+        sys.exit("Thumbnail job is already running")
+    if not thumbnailJob.run():
+        counts = jobProgress(thumbnailJob.job)
+        sys.exit(f"Thumbnail job stopped with {counts[DONE]} of {counts['total']} thumbnails done")
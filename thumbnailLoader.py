@@ -0,0 +1,94 @@
+"""Prepares card thumbnails on a worker thread.
+
+The browser shows its cards straight away with a placeholder and hands the
+loader one request per card, most visible card first. The worker reads and
+decodes each image (a QImage cut from an atlas page, or a whole image file)
+and passes it back through 'schedule', which in Maya is
+maya.utils.executeDeferred, so the image is shown on the main thread.
+Showing another page drops the requests of the previous one that haven't
+been loaded yet.
+
+QImage can be used off the main thread, QPixmap can't, so images are
+turned into pixmaps when they're delivered. Without Qt the worker only
+passes the image path back.
+"""
+
+import collections
+import threading
+
+
+class ThumbnailLoader:
+    """Loads images for 'deliver(key, image, path)', called through
+    'schedule(deliver, key, image, path)'. 'image' is a QImage, or None when
+    Qt isn't available or the image couldn't be read."""
+
+    __slots__ = ("schedule", "deliver", "QtGui", "requests", "condition", "pages", "pagesLock", "thread")
+
+    def __init__(self, schedule, deliver, QtGui=None):
+        self.schedule = schedule
+        self.deliver = deliver
+        self.QtGui = QtGui
+        self.requests = collections.deque()
+        self.condition = threading.Condition()
+        self.pages = {}  # atlas page path -> QImage
+        self.pagesLock = threading.Lock()
+        self.thread = None
+
+    def load(self, requests, replace: bool = True) -> None:
+        """Queues (key, source, path) requests in the order they should load.
+        'source' is an image path, or (atlas page path, x, y, width, height).
+        'replace' drops requests that are still waiting."""
+        with self.condition:
+            if replace:
+                self.requests.clear()
+            self.requests.extend(requests)
+            self.condition.notify()
+            # The worker clears 'thread' under the same lock before it stops,
+            # so requests are never left without a worker to load them
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def forgetPages(self, pagePaths=None) -> None:
+        """Drops cached atlas pages so they're read again, all of them if 'pagePaths' is None."""
+        with self.pagesLock:
+            if pagePaths is None:
+                self.pages.clear()
+            for pagePath in pagePaths or []:
+                self.pages.pop(pagePath, None)
+
+    def prepare(self, source):
+        """Reads and decodes an image, returns None if it can't be."""
+        if self.QtGui is None:
+            return None
+        if isinstance(source, str):
+            image = self.QtGui.QImage(source)
+            return None if image.isNull() else image
+
+        pagePath, x, y, width, height = source
+        with self.pagesLock:
+            page = self.pages.get(pagePath)
+        if page is None:
+            page = self.QtGui.QImage(pagePath)
+            if page.isNull():
+                return None
+            with self.pagesLock:
+                self.pages[pagePath] = page
+        return page.copy(x, y, width, height)
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.requests:
+                    # Stop once idle, load() starts a new worker when needed.
+                    # Requests queued just as the wait timed out are loaded first
+                    if not self.condition.wait(timeout=10.0) and not self.requests:
+                        self.thread = None
+                        return
+                key, source, path = self.requests.popleft()
+            try:
+                image = self.prepare(source)
+            except Exception as error:  # a bad image mustn't stop the other cards from loading
+                print(f"Couldn't load thumbnail {path}: {error}")
+                image = None
+            self.schedule(self.deliver, key, image, path)
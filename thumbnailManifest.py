@@ -0,0 +1,100 @@
+"""Records what each thumbnail image was rendered from.
+
+The manifest maps an image name to the content hash of its IES file, the
+renderer and its settings, and the version of the scene it was rendered
+in. A thumbnail is stale once any of those changed, so a thumbnail job
+re-renders exactly the stale and missing images. Images that aren't in the
+manifest (shipped or hand-made thumbnails) are never treated as stale.
+
+Renders that run in the background are queued as pending entries and only
+recorded once their image has been written, so a failed or cancelled
+render is picked up again by the next job.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_NAME = "thumbnails.json"
+MANIFEST_VERSION = 1
+
+
+def readManifest(cacheDirectory: str) -> dict:
+    """Reads the thumbnail manifest, returns an empty one if it's missing or outdated."""
+    emptyManifest = {"version": MANIFEST_VERSION, "thumbnails": {}, "pending": {}}
+    try:
+        with open(os.path.join(cacheDirectory, MANIFEST_NAME), "r") as manifestFile:
+            manifest = json.load(manifestFile)
+    except (OSError, ValueError):
+        return emptyManifest
+    if manifest.get("version") != MANIFEST_VERSION:
+        return emptyManifest
+    return manifest
+
+
+def writeManifest(cacheDirectory: str, manifest: dict) -> None:
+    os.makedirs(cacheDirectory, exist_ok=True)
+    temporaryManifest = os.path.join(cacheDirectory, MANIFEST_NAME + ".tmp")
+    with open(temporaryManifest, "w") as manifestFile:
+        json.dump(manifest, manifestFile)
+    os.replace(temporaryManifest, os.path.join(cacheDirectory, MANIFEST_NAME))
+
+
+def sceneVersion(scenePath: str) -> str:
+    """Returns a short hash of a thumbnail scene file, changes whenever the scene is edited."""
+    try:
+        with open(scenePath, "rb") as sceneFile:
+            return hashlib.blake2b(sceneFile.read(), digest_size=8).hexdigest()
+    except OSError:
+        return ""
+
+
+def thumbnailEntry(profileHash: str, renderer: str, scene: str, settings: dict = None) -> dict:
+    return {"hash": profileHash, "renderer": renderer, "scene": scene, "settings": settings or {}}
+
+
+def recordThumbnails(manifest: dict, entries: dict) -> None:
+    """Records image name -> thumbnailEntry for images that have been written."""
+    for name, entry in entries.items():
+        manifest["thumbnails"][name] = entry
+        manifest["pending"].pop(name, None)
+
+
+def queueThumbnails(manifest: dict, entries: dict) -> None:
+    """Adds image name -> thumbnailEntry for images a background job is about to render."""
+    queued = time.time()
+    for name, entry in entries.items():
+        manifest["pending"][name] = dict(entry, queued=queued)
+
+
+def settleThumbnails(manifest: dict, imageDirectory: str) -> bool:
+    """Records pending thumbnails whose image was written after they were
+    queued. Returns True if the manifest changed."""
+    changed = False
+    for name, entry in list(manifest["pending"].items()):
+        try:
+            written = os.path.getmtime(os.path.join(imageDirectory, name + ".png"))
+        except OSError:
+            continue
+        if written >= entry["queued"]:
+            entry = dict(entry)
+            del entry["queued"]
+            recordThumbnails(manifest, {name: entry})
+            changed = True
+    return changed
+
+
+def staleThumbnails(manifest: dict, profileHashes: dict, currentSettings: dict) -> list:
+    """Returns the image names whose thumbnail no longer matches its profile.
+    'profileHashes' is image name -> current content hash, 'currentSettings'
+    is renderer -> (scene version, settings) the renderer would use now."""
+    stale = []
+    for name, profileHash in profileHashes.items():
+        entry = manifest["thumbnails"].get(name)
+        if entry is None:
+            continue
+        scene, settings = currentSettings.get(entry["renderer"], (entry["scene"], entry["settings"]))
+        if entry["hash"] != profileHash or entry["scene"] != scene or entry["settings"] != settings:
+            stale.append(name)
+    return stale
@@ -0,0 +1,115 @@
+"""Small copies of every thumbnail for the profile cards and preview.
+
+Thumbnails in IES_images are rendered at 512 px by Maya and 256 px by the
+analytic renderer, while cards show them at 64 to 256 px. Each image is
+scaled once to every size in PYRAMID_SIZES and stored in
+IES_cache/thumbnails/<size>/<name>.png, so the browser only decodes and
+keeps the pixels it actually shows. A level is rebuilt when its
+image is newer than it, and dropped once the image is removed.
+"""
+
+import os
+
+import numpy as np
+
+import pngImage
+
+PYRAMID_FOLDER = "thumbnails"
+PYRAMID_SIZES = (64, 128, 256)
+
+
+def levelPath(cacheDirectory: str, size: int, name: str) -> str:
+    return f"{cacheDirectory}/{PYRAMID_FOLDER}/{size}/{name}.png"
+
+
+def placeholderPath(cacheDirectory: str) -> str:
+    """Plain dark square shown on cards while their thumbnail loads, written
+    the first time it's needed."""
+    path = f"{cacheDirectory}/{PYRAMID_FOLDER}/placeholder.png"
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pngImage.writePNG(path, np.full((PYRAMID_SIZES[0], PYRAMID_SIZES[0]), 40, dtype=np.uint8))
+    return path
+
+
+def levelSize(displaySize: int) -> int:
+    """Smallest pyramid size that covers 'displaySize' pixels, the largest if none do."""
+    for size in PYRAMID_SIZES:
+        if size >= displaySize:
+            return size
+    return PYRAMID_SIZES[-1]
+
+
+def sourceImages(imageDirectory: str) -> dict:
+    """Returns image name -> modification time of every png in the image folder."""
+    images = {}
+    with os.scandir(imageDirectory) as entries:
+        for entry in entries:
+            name, extension = os.path.splitext(entry.name)
+            if extension.lower() == ".png" and entry.is_file():
+                images[name] = entry.stat().st_mtime
+    return images
+
+
+def levelTimes(cacheDirectory: str, size: int) -> dict:
+    """Returns image name -> modification time of every image in one pyramid level."""
+    folder = f"{cacheDirectory}/{PYRAMID_FOLDER}/{size}"
+    os.makedirs(folder, exist_ok=True)
+    return sourceImages(folder)
+
+
+def modifiedTime(path: str) -> float:
+    """Modification time of a file, -1 if it doesn't exist."""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return -1.0
+
+
+def writeLevels(imagePath: str, cacheDirectory: str, name: str, sizes=PYRAMID_SIZES) -> None:
+    """Scales one image to each pyramid size. Images that can't be read are skipped."""
+    try:
+        pixels = pngImage.readPNG(imagePath)
+    except (OSError, ValueError, KeyError) as error:
+        print(f"Couldn't scale thumbnail {imagePath}: {error}")
+        return
+    for size in sizes:
+        pngImage.writePNG(levelPath(cacheDirectory, size, name), pngImage.resizeImage(pixels, size))
+
+
+def updatePyramid(
+    imageDirectory: str, cacheDirectory: str, names=None, progress=None, images=None
+) -> list:
+    """Rebuilds the pyramid levels of images that are new or changed. 'names'
+    limits the update to a few images, otherwise the whole image folder is
+    scanned, or taken from 'images' (name -> modification time) when the
+    caller already listed it, and levels of removed images are deleted.
+    'progress' is called with (done, total) while levels are written.
+    Returns the updated names."""
+    if names is None:
+        images = sourceImages(imageDirectory) if images is None else images
+        levels = {size: levelTimes(cacheDirectory, size) for size in PYRAMID_SIZES}
+        for size, times in levels.items():
+            for name in set(times) - set(images):
+                os.remove(levelPath(cacheDirectory, size, name))
+    else:
+        # A few images, checked one by one rather than listing every folder
+        images = {name: modifiedTime(os.path.join(imageDirectory, name + ".png")) for name in names}
+        images = {name: written for name, written in images.items() if written >= 0}
+        levels = {
+            size: {name: modifiedTime(levelPath(cacheDirectory, size, name)) for name in images}
+            for size in PYRAMID_SIZES
+        }
+        for size in PYRAMID_SIZES:
+            os.makedirs(f"{cacheDirectory}/{PYRAMID_FOLDER}/{size}", exist_ok=True)
+
+    outdated = [
+        name
+        for name, written in images.items()
+        if any(levels[size].get(name, -1.0) < written for size in PYRAMID_SIZES)
+    ]
+    for done, name in enumerate(outdated, 1):
+        writeLevels(os.path.join(imageDirectory, name + ".png"), cacheDirectory, name)
+        if progress:
+            progress(done, len(outdated))
+    return outdated